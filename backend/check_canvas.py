@@ -27,21 +27,10 @@ def check_syllabus(course_name):
     print()
     print("🔍 Looking for Canvas syllabus workflow...")
 
-    workflows = memory.list_workflows(status='ready')
-    canvas_wf = None
+    # Look for syllabus + canvas keywords (via the memory's keyword index)
+    wf_ids = memory.lookup_by_keywords(['canvas', 'syllabus'], status='ready')
 
-    for wf in workflows:
-        description = wf.get('description', '').lower()
-        name = wf.get('name', '').lower()
-
-        # Look for syllabus + canvas keywords
-        if ('syllabus' in description or 'syllabus' in name) and \
-           ('canvas' in description or 'canvas' in name):
-            canvas_wf = wf
-            print(f"✅ Found workflow: {wf['name']}")
-            break
-
-    if not canvas_wf:
+    if not wf_ids:
         print()
         print("❌ No Canvas syllabus workflow found!")
         print()
@@ -57,7 +46,8 @@ def check_syllabus(course_name):
         return False
 
     # Load full workflow to check parameters
-    full_wf = memory.get_workflow(canvas_wf['workflow_id'])
+    full_wf = memory.get_workflow(wf_ids[0])
+    print(f"✅ Found workflow: {full_wf['name']}")
 
     # Determine parameter name
     param_name = 'course_name'
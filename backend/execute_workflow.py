@@ -4,6 +4,8 @@ Execute Workflow - Interactive CLI
 Choose and execute any learned workflow with parameters
 """
 
+from concurrent.futures import ThreadPoolExecutor
+
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -20,7 +22,13 @@ def main():
     # Initialize
     print("Loading workflows...")
     memory = VisualWorkflowMemory()
-    executor = GeminiWorkflowExecutor(memory=memory, verbose=True)
+
+    # Build the executor (Gemini client, workflow dictionary, system prompt)
+    # while the user picks a workflow and enters parameters. It is built
+    # quietly so its output doesn't interleave with the prompts.
+    background = ThreadPoolExecutor(max_workers=1)
+    executor_future = background.submit(GeminiWorkflowExecutor, memory=memory, verbose=False)
+    background.shutdown(wait=False)
 
     # List available workflows
     workflows = memory.list_workflows(status='ready')
@@ -103,6 +111,10 @@ def main():
         print("❌ Cancelled")
         return
 
+    executor = executor_future.result()
+    executor.verbose = True
+    executor.gemini.verbose = True
+
     # Execute!
     print()
     print("=" * 70)
@@ -0,0 +1,81 @@
+"""
+Shared Gemini Client
+One genai.Client per API key for the whole process, created on first use
+"""
+
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Optional
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Markdown code fences around model JSON (an unterminated fence runs to the end)
+_JSON_FENCE_RE = re.compile(r"```json(.*?)(?:```|\Z)", re.S)
+_ANY_FENCE_RE = re.compile(r"```(.*?)(?:```|\Z)", re.S)
+
+
+def get_gemini_client(api_key: Optional[str] = None):
+    """
+    Get the process-wide Gemini client.
+
+    Components share a single client (and its connection pool) instead of
+    each paying for client setup on construction.
+
+    Args:
+        api_key: API key to use (defaults to GOOGLE_API_KEY)
+
+    Returns:
+        genai.Client instance
+    """
+    api_key = api_key or os.getenv("GOOGLE_API_KEY")
+
+    # Components are built on parallel threads - create the client once
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            from google import genai
+            client = genai.Client(api_key=api_key)
+            _clients[api_key] = client
+    return client
+
+
+@lru_cache(maxsize=None)
+def get_generation_config(temperature: float,
+                          max_output_tokens: Optional[int] = None,
+                          response_mime_type: Optional[str] = None):
+    """
+    Get a shared GenerateContentConfig for these settings.
+
+    Every Gemini call site uses one of a handful of fixed settings, so each
+    config is built once per process instead of on every request.
+    """
+    from google.genai.types import GenerateContentConfig
+    kwargs = {'temperature': temperature}
+    if max_output_tokens is not None:
+        kwargs['max_output_tokens'] = max_output_tokens
+    if response_mime_type is not None:
+        kwargs['response_mime_type'] = response_mime_type
+    return GenerateContentConfig(**kwargs)
+
+
+def extract_json_text(content: str) -> str:
+    """Strip markdown code fences from a model response, leaving the JSON text"""
+    match = _JSON_FENCE_RE.search(content) or _ANY_FENCE_RE.search(content)
+    if match:
+        return match.group(1).strip()
+    return content
+
+
+def debug_traceback(error: Exception):
+    """
+    Print the full traceback for an error being handled when AGENTFLOW_DEBUG
+    is set, otherwise just its type (these paths can repeat)
+    """
+    if os.getenv("AGENTFLOW_DEBUG"):
+        import traceback
+        traceback.print_exc()
+    else:
+        print(f"   ({type(error).__name__})")
@@ -4,95 +4,44 @@ Uses Google's native computer use capabilities for accurate screen interaction
 """
 
 import os
+import re
 import time
 import base64
+import hashlib
 import io
+import json
+import subprocess
+import sys
+import threading
 from typing import Dict, List, Optional, Tuple
 from PIL import Image
 import numpy as np
 import pyautogui
-from google import genai
 from google.genai.types import (
     Tool, 
-    GenerateContentConfig,
     GoogleSearch,
 )
 
+from gemini_client import get_gemini_client, get_generation_config, extract_json_text, debug_traceback
 
-class GeminiComputerUse:
-    """
-    Gemini 2.5 Computer Use with official Computer Use tool.
-    
-    Uses the official Computer Use API with normalized coordinates (0-999)
-    for maximum accuracy. See: https://ai.google.dev/gemini-api/docs/computer-use
-    
-    Features:
-    - Official Computer Use tool (most accurate)
-    - Normalized coordinates (0-999) automatically converted to pixels
-    - Native Retina/HiDPI support
-    - Built-in safety decisions
-    """
-    
-    def __init__(self,
-                 model: str = "gemini-2.0-flash-exp",
-                 use_computer_use_model: bool = False,
-                 verbose: bool = False,
-                 workflows_dict: Optional[Dict[str, List[Dict]]] = None):
-        """
-        Initialize Gemini Computer Use
-
-        Args:
-            model: Gemini model to use
-                   - "gemini-2.0-flash-exp" (default, custom approach)
-                   - "gemini-2.5-computer-use-preview-10-2025" (official Computer Use model)
-            use_computer_use_model: If True, use official Computer Use model and tool
-            verbose: Print debug information
-            workflows_dict: Optional dict of {intention: semantic_actions} for system context
-        """
-        self.verbose = verbose
-        self.model = model
-        self.use_computer_use_model = use_computer_use_model
-        self.api_key = os.getenv("GOOGLE_API_KEY")
-        self.workflows_dict = workflows_dict or {}
-
-        if not self.api_key:
-            raise ValueError("GOOGLE_API_KEY environment variable not set!")
-
-        # Initialize Gemini client
-        self.client = genai.Client(api_key=self.api_key)
-
-        # Configure tools based on mode
-        if self.use_computer_use_model:
-            # Official Computer Use tool
-            from google.genai.types import ComputerUse, Environment
-            self.tools = [
-                Tool(computer_use=ComputerUse(environment=Environment.ENVIRONMENT_BROWSER))
-            ]
-        else:
-            # Regular tools
-            self.tools = [
-                Tool(google_search=GoogleSearch()),
-            ]
+# In-process screen capture (optional) - pyautogui.screenshot() shells out to
+# screencapture and round-trips a temp PNG through disk on macOS
+try:
+    import mss
+    MSS_AVAILABLE = True
+except:
+    MSS_AVAILABLE = False
 
-        # Build system prompt with workflows
-        self.system_prompt = self._build_system_prompt()
+# Fast non-cryptographic hashing for screen fingerprints (optional)
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except:
+    XXHASH_AVAILABLE = False
 
-        if self.verbose:
-            print(f"✅ Gemini Computer Use initialized")
-            if self.use_computer_use_model:
-                print(f"   Model: {model} (Official Computer Use)")
-                print(f"   Using official Computer Use tool with normalized coordinates")
-            else:
-                print(f"   Model: {model} (Custom approach)")
-                print(f"   Using manual coordinate detection")
-            if self.workflows_dict:
-                print(f"   Loaded {len(self.workflows_dict)} workflows into system context")
 
-    def _build_system_prompt(self) -> str:
-        """Build system prompt with all workflows"""
-        import json
-
-        prompt = """
+# Fixed parts of the system prompt; workflows are listed in between
+_SYSTEM_PROMPT_HEAD = """
 # HARDCODED WORKFLOW TEMPLATES
 
 These are common workflow patterns that you can use as templates for various tasks:
@@ -154,23 +103,7 @@ You have access to the following learned workflows. Each workflow shows a sequen
 
 """
 
-        if self.workflows_dict:
-            for intention, actions in self.workflows_dict.items():
-                prompt += f"\n## Workflow: {intention}\n\n"
-                prompt += "Semantic Actions:\n"
-                for i, action in enumerate(actions, 1):
-                    prompt += f"{i}. [{action['semantic_type']}] {action.get('description', 'N/A')}\n"
-                    if action.get('target'):
-                        prompt += f"   Target: {action['target']}\n"
-                    if action.get('value'):
-                        prompt += f"   Value: {action['value']}\n"
-                    if action.get('is_parameterizable'):
-                        prompt += f"   Parameter: {action.get('parameter_name')}\n"
-                prompt += "\n"
-        else:
-            prompt += "(No learned workflows available yet)\n\n"
-
-        prompt += """
+_SYSTEM_PROMPT_TAIL = """
 ---
 
 ## How to Use These Workflows
@@ -192,7 +125,302 @@ When the user requests a task, check if it matches any of these workflows.
 Follow the semantic actions from the workflow, adapting parameters as needed based on the user's request and current screen state.
 """
 
-        return prompt
+# Longest screenshot edge sent to Gemini in token-efficient mode. Element
+# lookup uses normalized (0-999) coordinates, so downscaling doesn't affect
+# click positions but cuts image tokens and upload size several-fold.
+SCREENSHOT_MAX_DIM = 1024
+SCREENSHOT_JPEG_QUALITY = 80
+
+# Longest edge of lossless PNG screenshots (token-efficient mode off). Retina
+# captures are ~3000px wide, well past what the 0-999 coordinate grid can
+# use; capping them cuts encode time and upload size roughly 4x.
+SCREENSHOT_PNG_MAX_DIM = int(os.getenv("AGENTFLOW_SCREENSHOT_PNG_MAX_DIM", "1280"))
+
+# PNGs are encoded for every vision call; zlib level 1 is several
+# times faster than PIL's default (and far faster than optimize=True) for a
+# modestly larger upload. PNG is lossless, so the image is identical.
+SCREENSHOT_PNG_COMPRESS_LEVEL = 1
+
+# pyautogui sleeps PAUSE seconds after every click/press/hotkey (default 0.1).
+# The executor already waits explicitly wherever the UI needs time to settle,
+# so the default just stacks on top of those waits.
+PYAUTOGUI_PAUSE = 0.02
+
+# NOTE: PAUSE is process-wide - importing this module lowers it for every
+# pyautogui caller in the process, not just GeminiComputerUse. Code that
+# relies on the 0.1s default must sleep explicitly (the executor does).
+pyautogui.PAUSE = PYAUTOGUI_PAUSE
+
+# Text longer than this is pasted through the clipboard instead of typed.
+# pyautogui.write() sleeps between characters, so a 40-character URL takes
+# ~2s to type but ~50ms to paste.
+PASTE_MIN_LENGTH = 8
+# How long the target app gets to read the pasted text before the user's
+# clipboard is put back (Cmd+V is handled asynchronously)
+PASTE_RESTORE_DELAY = 0.25
+
+
+def downscale_for_vision(image: Image.Image, max_dim: int = SCREENSHOT_MAX_DIM) -> Image.Image:
+    """Return a copy of image that fits in max_dim x max_dim (or image itself if it already fits)"""
+    width, height = image.size
+    if max(width, height) <= max_dim:
+        return image
+    # Resize straight from the original (no intermediate full-size copy)
+    scale = max_dim / max(width, height)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return image.resize(size, Image.LANCZOS, reducing_gap=2.0)
+
+
+# Targets naming any of these words get extra Gmail compose-window hints
+_GMAIL_COMPOSE_WORDS = frozenset({'to', 'subject', 'compose', 'recipient', 'recipients'})
+_WORD_RE = re.compile(r"\w+")
+
+
+# Where to click inside an element's bounding box, as (x, y) fractions.
+# Buttons are clicked slightly left of center for better accuracy (some
+# buttons have visual effects that make the center less reliable);
+# everything else at the center.
+_CENTER_OFFSET = (0.50, 0.50)
+_CLICK_OFFSETS = {
+    'button': (0.40, 0.50),
+}
+
+# mss handles are not thread-safe, so each thread grabs with its own
+_capture_local = threading.local()
+
+
+def capture_screen() -> np.ndarray:
+    """
+    Capture the primary screen as an RGB uint8 array (physical pixels,
+    same as np.array(pyautogui.screenshot())).
+    """
+    if MSS_AVAILABLE:
+        try:
+            sct = getattr(_capture_local, 'sct', None)
+            if sct is None:
+                sct = _capture_local.sct = mss.mss()
+            shot = sct.grab(sct.monitors[1])
+            # BGRA -> RGB in one copy
+            return np.ascontiguousarray(np.asarray(shot)[:, :, 2::-1])
+        except Exception:
+            pass
+    return np.array(pyautogui.screenshot())
+
+
+def enter_text(text: str, interval: float = 0.05):
+    """
+    Type text into the focused element. Longer single-line text is pasted
+    via the clipboard (macOS only); short text, text with control characters
+    (e.g. newlines that should press Enter), or a failed paste fall back to
+    pyautogui.write(). The user's clipboard is saved before pasting and
+    restored afterwards as plain text; if it holds something other than text
+    (an image, files) the text is typed instead so that nothing is lost.
+    """
+    if sys.platform == 'darwin' and len(text) > PASTE_MIN_LENGTH and text.isprintable():
+        saved = _save_clipboard()
+        if saved is not None:
+            try:
+                subprocess.run(['pbcopy'], input=text.encode('utf-8'), check=True, timeout=2)
+                pyautogui.hotkey('command', 'v')
+                time.sleep(PASTE_RESTORE_DELAY)
+                return
+            except Exception:
+                pass
+            finally:
+                _restore_clipboard(saved)
+    pyautogui.write(text, interval=interval)
+
+
+def _save_clipboard() -> Optional[bytes]:
+    """
+    Current text clipboard contents, or None when they can't be saved and
+    restored as text (non-text data, or pbpaste failed)
+    """
+    try:
+        types = subprocess.run(['osascript', '-e', 'clipboard info'],
+                               capture_output=True, check=True, timeout=2).stdout
+        # An empty clipboard has no types; anything else must be plain text
+        # (copied Finder files also carry their names as a string)
+        if types.strip() and (b'string' not in types or b'furl' in types):
+            return None
+        return subprocess.run(['pbpaste'], capture_output=True, check=True, timeout=2).stdout
+    except Exception:
+        return None
+
+
+def _restore_clipboard(contents: bytes):
+    """Put saved text back on the clipboard"""
+    try:
+        subprocess.run(['pbcopy'], input=contents, check=True, timeout=2)
+    except Exception:
+        pass
+
+
+class VisionEpochCache:
+    """
+    Remembers where targets were located on the current screen state.
+
+    The screen is fingerprinted from a coarse pixel sample of each screenshot.
+    While the fingerprint stays the same, a target that was already located
+    is answered from the cache instead of sending another screenshot to
+    Gemini. Any visible change starts a new epoch. Misses are never cached,
+    so a retry always asks Gemini again.
+    """
+
+    def __init__(self, sample_stride: int = 16):
+        """
+        Args:
+            sample_stride: Take every Nth pixel in each direction when fingerprinting
+        """
+        self.sample_stride = sample_stride
+        self.fingerprint = None
+        self.locations: Dict[str, Tuple[int, int]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def compute_fingerprint(self, screenshot: np.ndarray) -> int:
+        """Cheap page-state fingerprint from a downsampled screenshot"""
+        # One contiguous buffer, hashed in a single call without a bytes copy
+        sample = np.ascontiguousarray(screenshot[::self.sample_stride, ::self.sample_stride])
+        if XXHASH_AVAILABLE:
+            return xxhash.xxh3_64_intdigest(sample)
+        return int.from_bytes(hashlib.blake2b(sample, digest_size=8).digest(), 'little')
+
+    def observe(self, screenshot: np.ndarray) -> bool:
+        """
+        Record the current screen state.
+
+        Returns:
+            True if the screen is unchanged since the last observation
+        """
+        fingerprint = self.compute_fingerprint(screenshot)
+        if fingerprint == self.fingerprint:
+            return True
+        self.fingerprint = fingerprint
+        self.locations = {}
+        return False
+
+    def lookup(self, target: str) -> Optional[Tuple[int, int]]:
+        """Click point of a target located in the current epoch, or None"""
+        point = self.locations.get(target)
+        if point is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return point
+
+    def store(self, target: str, point: Tuple[int, int]):
+        """Remember where a target was located on the current screen"""
+        self.locations[target] = point
+
+    def invalidate(self):
+        """Forget the current epoch (e.g. after an action that changes the screen)"""
+        self.fingerprint = None
+        self.locations = {}
+
+
+class GeminiComputerUse:
+    """
+    Gemini 2.5 Computer Use with official Computer Use tool.
+    
+    Uses the official Computer Use API with normalized coordinates (0-999)
+    for maximum accuracy. See: https://ai.google.dev/gemini-api/docs/computer-use
+    
+    Features:
+    - Official Computer Use tool (most accurate)
+    - Normalized coordinates (0-999) automatically converted to pixels
+    - Native Retina/HiDPI support
+    - Built-in safety decisions
+    """
+    
+    def __init__(self,
+                 model: str = "gemini-2.0-flash-exp",
+                 use_computer_use_model: bool = False,
+                 verbose: bool = False,
+                 workflows_dict: Optional[Dict[str, List[Dict]]] = None,
+                 token_efficient_mode: bool = True):
+        """
+        Initialize Gemini Computer Use
+
+        Args:
+            model: Gemini model to use
+                   - "gemini-2.0-flash-exp" (default, custom approach)
+                   - "gemini-2.5-computer-use-preview-10-2025" (official Computer Use model)
+            use_computer_use_model: If True, use official Computer Use model and tool
+            verbose: Print debug information
+            workflows_dict: Optional dict of {intention: semantic_actions} for system context
+            token_efficient_mode: Send downscaled JPEG screenshots instead of full-size PNGs
+        """
+        self.verbose = verbose
+        self.model = model
+        self.use_computer_use_model = use_computer_use_model
+        self.api_key = os.getenv("GOOGLE_API_KEY")
+        self.workflows_dict = workflows_dict or {}
+        self.token_efficient_mode = token_efficient_mode
+
+        # Optional per-execution cache of located elements (see VisionEpochCache)
+        self.vision_cache: Optional[VisionEpochCache] = None
+
+        if not self.api_key:
+            raise ValueError("GOOGLE_API_KEY environment variable not set!")
+
+        # Initialize Gemini client
+        self.client = get_gemini_client(self.api_key)
+
+        # Configure tools based on mode
+        if self.use_computer_use_model:
+            # Official Computer Use tool
+            from google.genai.types import ComputerUse, Environment
+            self.tools = [
+                Tool(computer_use=ComputerUse(environment=Environment.ENVIRONMENT_BROWSER))
+            ]
+        else:
+            # Regular tools
+            self.tools = [
+                Tool(google_search=GoogleSearch()),
+            ]
+
+        # Build system prompt with workflows
+        self.system_prompt = self._build_system_prompt()
+
+        if self.verbose:
+            print(f"✅ Gemini Computer Use initialized")
+            if self.use_computer_use_model:
+                print(f"   Model: {model} (Official Computer Use)")
+                print(f"   Using official Computer Use tool with normalized coordinates")
+            else:
+                print(f"   Model: {model} (Custom approach)")
+                print(f"   Using manual coordinate detection")
+            if self.workflows_dict:
+                print(f"   Loaded {len(self.workflows_dict)} workflows into system context")
+
+    def _build_system_prompt(self) -> str:
+        """Build system prompt with all workflows"""
+        parts = [_SYSTEM_PROMPT_HEAD]
+
+        if self.workflows_dict:
+            for intention, actions in self.workflows_dict.items():
+                parts.append(f"\n## Workflow: {intention}\n\nSemantic Actions:\n")
+                for i, action in enumerate(actions, 1):
+                    parts.append(f"{i}. [{action['semantic_type']}] {action.get('description', 'N/A')}\n")
+                    if action.get('target'):
+                        parts.append(f"   Target: {action['target']}\n")
+                    if action.get('value'):
+                        parts.append(f"   Value: {action['value']}\n")
+                    if action.get('is_parameterizable'):
+                        parts.append(f"   Parameter: {action.get('parameter_name')}\n")
+                parts.append("\n")
+        else:
+            parts.append("(No learned workflows available yet)\n\n")
+
+        parts.append(_SYSTEM_PROMPT_TAIL)
+
+        return ''.join(parts)
+
+    @property
+    def screenshot_mime_type(self) -> str:
+        """MIME type of images produced by _encode_screenshot"""
+        return "image/jpeg" if self.token_efficient_mode else "image/png"
 
     def _encode_screenshot(self, screenshot: np.ndarray) -> str:
         """Encode screenshot to base64 for Gemini"""
@@ -205,12 +433,17 @@ Follow the semantic actions from the workflow, adapting parameters as needed bas
         if pil_image.mode == 'RGBA':
             pil_image = pil_image.convert('RGB')
         
-        # Encode as PNG for best quality
         buffer = io.BytesIO()
-        pil_image.save(buffer, format="PNG", optimize=True)
-        buffer.seek(0)
+        if self.token_efficient_mode:
+            # Downscaled JPEG - a fraction of the tokens, same element lookup
+            pil_image = downscale_for_vision(pil_image)
+            pil_image.save(buffer, format="JPEG", quality=SCREENSHOT_JPEG_QUALITY)
+        else:
+            # Lossless PNG, capped at SCREENSHOT_PNG_MAX_DIM
+            pil_image = downscale_for_vision(pil_image, SCREENSHOT_PNG_MAX_DIM)
+            pil_image.save(buffer, format="PNG", compress_level=SCREENSHOT_PNG_COMPRESS_LEVEL)
         
-        return base64.b64encode(buffer.read()).decode('utf-8')
+        return base64.b64encode(buffer.getbuffer()).decode('utf-8')
     
     @staticmethod
     def get_screen_scaling(screenshot: np.ndarray) -> Tuple[float, float]:
@@ -271,7 +504,15 @@ Follow the semantic actions from the workflow, adapting parameters as needed bas
             Screen is 1440x900
             Result: (720, 450) # Center of actual screen
         """
-        return int(x / 1000 * screen_width), int(y / 1000 * screen_height)
+        # Clamp to the 0-999 grid so an out-of-range reply (e.g. 1000) can't
+        # land off-screen
+        x = int(x)
+        y = int(y)
+        x = 0 if x < 0 else 999 if x > 999 else x
+        y = 0 if y < 0 else 999 if y > 999 else y
+        # Integer math: exact, and avoids float truncation landing one pixel
+        # short (e.g. 290 / 1000 * 100 == 28.999999999999996)
+        return x * screen_width // 1000, y * screen_height // 1000
     
     def click(self, target: str, screenshot: Optional[np.ndarray] = None, retry_on_fail: bool = True) -> bool:
         """
@@ -290,12 +531,21 @@ Follow the semantic actions from the workflow, adapting parameters as needed bas
         if screenshot is None:
             if self.verbose:
                 print("📸 Capturing screenshot...")
-            screenshot = np.array(pyautogui.screenshot())
+            screenshot = capture_screen()
         
         img_height, img_width = screenshot.shape[:2]
         
-        # Calculate scaling factor for Retina/HiDPI displays
-        scale_x, scale_y = self.get_screen_scaling(screenshot)
+        # Reuse the previous vision result if the screen hasn't changed
+        cache = self.vision_cache
+        if cache is not None:
+            cache.observe(screenshot)
+            point = cache.lookup(target)
+            if point is not None:
+                if self.verbose:
+                    print(f"⚡ Screen unchanged, reusing location of '{target}'")
+                    print(f"🖱️  Clicking at ({point[0]}, {point[1]})...")
+                pyautogui.click(point[0], point[1])
+                return True
         
         if self.verbose:
             print(f"🤖 Asking Gemini to locate: '{target}'")
@@ -308,7 +558,7 @@ Follow the semantic actions from the workflow, adapting parameters as needed bas
             # Add special context for Gmail compose fields
             gmail_context = ""
             target_lower = target.lower()
-            if any(word in target_lower for word in ['to', 'subject', 'compose', 'recipient']):
+            if not _GMAIL_COMPOSE_WORDS.isdisjoint(_WORD_RE.findall(target_lower)):
                 gmail_context = """
 
 SPECIAL GMAIL COMPOSE WINDOW CONTEXT:
@@ -380,29 +630,22 @@ Example responses:
                             {"text": prompt},
                             {
                                 "inline_data": {
-                                    "mime_type": "image/png",
+                                    "mime_type": self.screenshot_mime_type,
                                     "data": img_base64
                                 }
                             }
                         ]
                     }
                 ],
-                config=GenerateContentConfig(
-                    temperature=0.1,
-                    max_output_tokens=1024,
-                )
+                config=get_generation_config(temperature=0.1, max_output_tokens=1024)
             )
             
             # Parse response
             content = response.text
             
             # Extract JSON (handle markdown code blocks)
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+            content = extract_json_text(content)
             
-            import json
             result = json.loads(content)
             
             elapsed = (time.time() - start_time) * 1000
@@ -458,16 +701,7 @@ Example responses:
                     return False
                 
                 # Calculate click position within bounding box
-                # For buttons, click slightly left-of-center for better accuracy
-                # (some buttons have visual effects that make the center less reliable)
-                if element_type == "button":
-                    # Click at 40% from left (slightly left of center) and 50% from top
-                    click_offset_x = 0.40
-                    click_offset_y = 0.50
-                else:
-                    # For other elements, use center
-                    click_offset_x = 0.50
-                    click_offset_y = 0.50
+                click_offset_x, click_offset_y = _CLICK_OFFSETS.get(element_type, _CENTER_OFFSET)
                 
                 # Calculate position with offset
                 width = x2 - x1
@@ -499,6 +733,9 @@ Example responses:
                 
                 pyautogui.click(click_x, click_y)
                 
+                if cache is not None:
+                    cache.store(target, (click_x, click_y))
+                
                 if self.verbose:
                     print("✅ Click successful!")
                 
@@ -529,8 +766,7 @@ Example responses:
         except Exception as e:
             if self.verbose:
                 print(f"❌ Error: {e}")
-                import traceback
-                traceback.print_exc()
+                debug_traceback(e)
             return False
     
     def _get_alternative_targets(self, target: str) -> List[str]:
@@ -601,7 +837,10 @@ Example responses:
         if self.verbose:
             print(f"⌨️  Typing: '{text}'")
         
-        pyautogui.typewrite(text, interval=0.05)
+        enter_text(text)
+        # Typed characters can be too small a change for the fingerprint
+        if self.vision_cache is not None:
+            self.vision_cache.invalidate()
         
         if self.verbose:
             print("✅ Typing complete!")
@@ -660,16 +899,12 @@ Respond in JSON:
     "direction": "up/down (for scroll)",
     "reasoning": "brief explanation"
 }}""",
-                config=GenerateContentConfig(temperature=0.1)
+                config=get_generation_config(temperature=0.1)
             )
             
             content = response.text
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+            content = extract_json_text(content)
             
-            import json
             parsed = json.loads(content)
             
             action = parsed['action']
@@ -713,7 +948,7 @@ def test_gemini_computer_use():
     
     # Capture screenshot
     print("\n📸 Capturing screenshot...")
-    screenshot = np.array(pyautogui.screenshot())
+    screenshot = capture_screen()
     
     # Test finding elements (without clicking)
     print("\n🔍 Testing element detection (no actual clicks)...")
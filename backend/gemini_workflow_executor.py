@@ -4,8 +4,14 @@ Executes learned workflows using Gemini 2.5 Flash for screen understanding
 Adapts workflows to new contexts automatically
 """
 
+import os
+import re
 import time
 import json
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, List, Tuple, Optional
 from pathlib import Path
 import numpy as np
@@ -13,10 +19,171 @@ import numpy as np
 import pyautogui
 from PIL import Image
 
-from gemini_computer_use import GeminiComputerUse
+from gemini_client import get_generation_config, extract_json_text, debug_traceback
+from gemini_computer_use import GeminiComputerUse, VisionEpochCache, capture_screen, enter_text
 from visual_memory import VisualWorkflowMemory
 from workflow_templates import merge_templates_with_learned
 
+# Named shortcuts; anything else is parsed as a '+'-joined key combination
+_KEYBOARD_SHORTCUTS = {
+    'cmd+l': ('command', 'l'),
+    'cmd+t': ('command', 't'),
+    'cmd+r': ('command', 'r'),
+    'cmd+w': ('command', 'w'),
+    'cmd+shift+t': ('command', 'shift', 't'),
+    'tab': ('tab',),
+    'enter': ('enter',),
+    'escape': ('escape',),
+    'cmd+shift+n': ('command', 'shift', 'n'),
+}
+
+
+# Substrings that mark text as a URL, as one compiled pattern (a single
+# scan instead of one `in` per indicator)
+_URL_INDICATOR_RE = re.compile(r"http|www\.|\.(?:com|edu|org|net|io)", re.IGNORECASE)
+
+# Actions that type or press keys. Their effect (typed characters, a moved
+# focus ring) can be too small for the vision cache's coarse fingerprint to
+# notice, so the cache is dropped after each of them
+_INPUT_ACTION_TYPES = frozenset({
+    'type', 'type_text', 'type_parameter', 'key', 'key_press',
+    'keyboard_shortcut', 'search', 'tab_navigate', 'navigate',
+    'use_recorded_workflow',
+})
+
+# Text in single or double quotes, e.g. "clicked on 'Submit'"
+_QUOTED_TEXT_RE = re.compile(r"'([^']+)'|\"([^\"]+)\"")
+
+
+def _first_quoted(text: str) -> Optional[str]:
+    """First single- or double-quoted substring of text, or None"""
+    match = _QUOTED_TEXT_RE.search(text)
+    if match is None:
+        return None
+    return match.group(1) or match.group(2)
+
+
+@lru_cache(maxsize=128)
+def _parse_shortcut(shortcut: str) -> Tuple[str, ...]:
+    """Keys to pass to pyautogui.hotkey for a shortcut string like 'cmd+shift+t'"""
+    shortcut = shortcut.lower()
+    return _KEYBOARD_SHORTCUTS.get(shortcut) or tuple(shortcut.split('+'))
+
+
+# Faster JSON parsing when available
+try:
+    import orjson
+    _loads_json = orjson.loads
+except:
+    _loads_json = json.loads
+
+
+# In-process window list (optional; installed alongside pyautogui on macOS) -
+# avoids spawning osascript on every frontmost-app poll
+try:
+    import Quartz
+    QUARTZ_AVAILABLE = True
+except:
+    QUARTZ_AVAILABLE = False
+
+# In-process AppleScript (optional; same pyobjc install as Quartz) - each
+# script is compiled once and re-run, instead of spawning osascript (and
+# recompiling the script) on every browser-URL poll
+try:
+    from Foundation import NSAppleScript
+    NSAPPLESCRIPT_AVAILABLE = True
+except:
+    NSAPPLESCRIPT_AVAILABLE = False
+
+_compiled_applescripts = {}
+_applescript_lock = threading.Lock()
+
+
+def _run_applescript(source: str) -> str:
+    """Run an AppleScript and return its result as text ('' on failure)"""
+    if NSAPPLESCRIPT_AVAILABLE:
+        try:
+            # NSAppleScript instances aren't thread-safe
+            with _applescript_lock:
+                script = _compiled_applescripts.get(source)
+                if script is None:
+                    script = NSAppleScript.alloc().initWithSource_(source)
+                    script.compileAndReturnError_(None)
+                    _compiled_applescripts[source] = script
+                result, _ = script.executeAndReturnError_(None)
+            if result is None:
+                return ''
+            return (result.stringValue() or '').strip()
+        except Exception:
+            pass
+
+    result = subprocess.run(['osascript', '-e', source], capture_output=True, text=True, timeout=2)
+    return result.stdout.strip()
+
+
+# Generalized-planning prompt pieces; the request, recorded context and
+# parameters are spliced in between at call time
+_PLANNING_PROMPT_INTRO = 'You are a HIGH-AGENCY, HIGH-AUTONOMY automation assistant with MAXIMUM INCENTIVE to complete the user\'s goal. The user wants to: "'
+_PLANNING_PROMPT_CONTEXT = "CONTEXT: Here's a similar workflow that was recorded before:\n"
+_PLANNING_PROMPT_BODY = """
+CURRENT SCREEN: I'll provide a screenshot of the current screen.
+
+🎯 YOUR MISSION: Complete the user's request with MAXIMUM AGENCY and ROBUSTNESS.
+
+⚠️  CRITICAL: DO NOT blindly copy the recorded workflow steps! 
+- The recorded workflow is CONTEXT to understand the GOAL, not a template to copy
+- Plan actions based on CURRENT SCREEN STATE, not recorded steps
+- Only include actions that make sense for the CURRENT situation
+- Don't include scroll actions if you're not even on the target page yet
+- Don't include course-specific actions if you haven't navigated to the course yet
+
+CORE PRINCIPLES:
+1. **HIGH AGENCY**: Take initiative, don't wait for perfect conditions
+2. **HIGH ROBUSTNESS**: Use multiple strategies, keyboard shortcuts preferred over mouse
+3. **HIGH AUTONOMY**: Self-correct when stuck, try alternative approaches
+4. **HIGH INCENTIVE**: You MUST complete the user's goal - failure is not an option
+5. **ADAPTIVE**: If something doesn't work, immediately try a different approach
+6. **CONTEXT-AWARE**: Plan based on current screen, not recorded steps
+
+STRATEGY HIERARCHY (in order of preference):
+1. **KEYBOARD SHORTCUTS** (most reliable) - Cmd+T, Cmd+L, Tab, Enter, etc.
+2. **Direct typing** with Tab navigation
+3. **Smart clicking** with multiple fallback descriptions
+4. **Scroll and search** to find elements
+5. **Alternative approaches** if primary fails
+
+ESCAPE STRATEGIES when stuck:
+- Take a new screenshot and re-analyze
+- Try keyboard shortcuts (Cmd+T for new tab, Cmd+L for address bar)
+- Use Tab to navigate between elements
+- Try different element descriptions
+- Scroll to find hidden elements
+- Use search functionality if available
+
+Return a JSON array of ROBUST actions:
+[
+    {
+        "action_type": "open_application" | "click" | "type" | "scroll" | "navigate" | "wait" | "keyboard_shortcut" | "tab_navigate" | "search",
+        "target": "what to interact with (for click/open_application)",
+        "value": "text to type (for type) or key name (for key) or wait seconds (for wait)",
+        "description": "human-readable description of this step",
+        "fallback_strategies": ["alternative approach 1", "alternative approach 2"],
+        "priority": "high" | "medium" | "low"
+    },
+    ...
+]
+
+CRITICAL RULES:
+- ALWAYS prefer keyboard shortcuts over mouse clicks
+- Use Cmd+L for address bar, Cmd+T for new tabs
+- Try multiple element descriptions if clicking fails
+- If stuck, take screenshot and re-analyze
+- NEVER give up - try alternative approaches
+- Focus on the user's SPECIFIC goal (e.g., "Machine Learning" not generic courses)
+- Be AGGRESSIVE in completing the task
+- PLAN BASED ON CURRENT SCREEN, NOT RECORDED STEPS
+"""
+
 
 class GeminiWorkflowExecutor:
     """
@@ -32,7 +199,8 @@ class GeminiWorkflowExecutor:
     def __init__(self,
                  memory: VisualWorkflowMemory = None,
                  gemini: GeminiComputerUse = None,
-                 verbose: bool = True):
+                 verbose: bool = True,
+                 token_efficient_mode: bool = True):
         """
         Initialize Gemini Workflow Executor
 
@@ -40,6 +208,9 @@ class GeminiWorkflowExecutor:
             memory: VisualWorkflowMemory instance
             gemini: GeminiComputerUse instance (or create new)
             verbose: Print detailed execution logs
+            token_efficient_mode: Send downscaled screenshots to Gemini
+                                  (a workflow can override this with its own
+                                  'token_efficient_mode' field)
         """
         self.memory = memory or VisualWorkflowMemory()
         self.verbose = verbose
@@ -49,14 +220,41 @@ class GeminiWorkflowExecutor:
         self.current_step_number = 0
         self.execution_results = []
 
+        # Workflow reloads can come from a background refresh and from a
+        # command at the same time - only one rebuilds the dict/prompt
+        self._workflows_lock = threading.RLock()
+
+        # (workflow_id, full_workflow) loaded ahead of time by prewarm()
+        self._prefetched_workflow = None
+
+        # Runs Gemini requests that can overlap with other work
+        self._request_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gemini-request")
+
+        # semantic_type -> handler(action, parameters); unknown types fall
+        # back to _execute_generic
+        self._semantic_handlers = {
+            'open_application': lambda action, parameters: self._execute_open_application(action),
+            'click_element': lambda action, parameters: self._execute_click_element(action),
+            'type_text': lambda action, parameters: self._execute_type_text(action),
+            'scroll': lambda action, parameters: self._execute_scroll_semantic(action),
+            'navigate': lambda action, parameters: self._execute_navigate(action),
+            'wait': lambda action, parameters: self._execute_wait(action),
+            'wait_until': lambda action, parameters: self._execute_wait_until(action),
+            'keyboard_shortcut': lambda action, parameters: self._execute_keyboard_shortcut(action.get('value')),
+            'use_recorded_workflow': self._execute_recorded_workflow,
+        }
+
         # Load all workflows as intention -> semantic_actions mapping
         self.workflows_by_intention = self._load_all_workflows()
+        self._memory_version = self.memory.version
 
         # Initialize Gemini with workflows in system prompt
         self.gemini = gemini or GeminiComputerUse(
             verbose=verbose,
-            workflows_dict=self.workflows_by_intention
+            workflows_dict=self.workflows_by_intention,
+            token_efficient_mode=token_efficient_mode
         )
+        self.token_efficient_mode = token_efficient_mode
 
         if self.verbose:
             print("✅ Gemini Workflow Executor initialized")
@@ -122,22 +320,28 @@ class GeminiWorkflowExecutor:
         
         return all_workflows
 
-    def reload_workflows(self):
+    def reload_workflows(self, quiet: bool = False):
         """
         Reload all workflows from memory.
         Call this after recording new workflows to update the dictionary.
         Templates are always included automatically.
+
+        Args:
+            quiet: Skip the progress output (e.g. when reloading in the background)
         """
-        if self.verbose:
+        verbose = self.verbose and not quiet
+        if verbose:
             print("🔄 Reloading workflows...")
 
-        self.workflows_by_intention = self._load_all_workflows()
+        with self._workflows_lock:
+            self.workflows_by_intention = self._load_all_workflows()
+            self._memory_version = self.memory.version
 
-        # Update Gemini's system prompt with new workflows
-        self.gemini.workflows_dict = self.workflows_by_intention
-        self.gemini.system_prompt = self.gemini._build_system_prompt()
+            # Update Gemini's system prompt with new workflows
+            self.gemini.workflows_dict = self.workflows_by_intention
+            self.gemini.system_prompt = self.gemini._build_system_prompt()
 
-        if self.verbose:
+        if verbose:
             from workflow_templates import list_available_templates
             template_count = len(list_available_templates())
             learned_count = len(self.workflows_by_intention) - template_count
@@ -147,6 +351,29 @@ class GeminiWorkflowExecutor:
             print(f"   - {learned_count} learned workflows")
             print("   System prompt updated")
 
+    def _sync_workflows(self, quiet: bool = False):
+        """Rebuild workflows and system prompt only if memory changed since the last load."""
+        with self._workflows_lock:
+            if self.memory.version != self._memory_version:
+                self.reload_workflows(quiet=quiet)
+
+    def prewarm(self, workflow: Dict):
+        """
+        Load a workflow's full data ahead of execution.
+        Run this while waiting on something else (parameter extraction,
+        user confirmation) so execute_workflow doesn't hit the disk.
+        """
+        # Templates are already complete in memory
+        if workflow.get('is_template', False):
+            return
+
+        workflow_id = workflow['workflow_id']
+        try:
+            self._prefetched_workflow = (workflow_id, self.memory.get_workflow(workflow_id))
+        except Exception as e:
+            if self.verbose:
+                print(f"⚠️  Could not prefetch workflow {workflow_id}: {e}")
+
     def get_workflow_by_intention(self, intention_query: str) -> Optional[List[Dict]]:
         """
         Find semantic actions for a workflow by matching the intention.
@@ -196,7 +423,8 @@ class GeminiWorkflowExecutor:
     def execute_workflow(self,
                         workflow: Dict,
                         parameters: Dict[str, str] = None,
-                        confirm_steps: bool = False) -> Tuple[bool, List[Dict]]:
+                        confirm_steps: bool = False,
+                        cache: VisionEpochCache = None) -> Tuple[bool, List[Dict]]:
         """
         Execute a learned workflow with optional parameters
         
@@ -205,14 +433,36 @@ class GeminiWorkflowExecutor:
             parameters: Optional parameter substitutions
                        e.g., {"class_name": "Machine Learning"}
             confirm_steps: Ask user to confirm each step
+            cache: Optional VisionEpochCache shared across steps
+                   (a fresh one is created per execution if not given)
         
         Returns:
             (success, execution_results)
         """
+        # Skip repeated vision calls while the screen state is unchanged
+        self.gemini.vision_cache = cache if cache is not None else VisionEpochCache()
+        try:
+            return self._run_workflow(workflow, parameters, confirm_steps)
+        finally:
+            # The cache only describes screens seen during this run - clicks
+            # made later (e.g. direct execution) must ask Gemini again
+            self.gemini.vision_cache = None
+    
+    def _run_workflow(self,
+                      workflow: Dict,
+                      parameters: Dict[str, str] = None,
+                      confirm_steps: bool = False) -> Tuple[bool, List[Dict]]:
+        """Body of execute_workflow (runs with the vision cache installed)"""
         self.current_workflow = workflow
         self.current_step_number = 0
         self.execution_results = []
         
+        # Pick up workflows recorded since the last run
+        self._sync_workflows()
+        
+        # Per-workflow override of screenshot downscaling
+        self.gemini.token_efficient_mode = workflow.get('token_efficient_mode', self.token_efficient_mode)
+        
         workflow_id = workflow['workflow_id']
         workflow_name = workflow['name']
         
@@ -235,11 +485,16 @@ class GeminiWorkflowExecutor:
             if self.verbose:
                 print("   📝 Using hardcoded template")
         else:
-            try:
-                full_workflow = self.memory.get_workflow(workflow_id)
-            except Exception as e:
-                print(f"❌ Could not load workflow: {e}")
-                return False, []
+            prefetched = self._prefetched_workflow
+            self._prefetched_workflow = None
+            if prefetched and prefetched[0] == workflow_id:
+                full_workflow = prefetched[1]
+            else:
+                try:
+                    full_workflow = self.memory.get_workflow(workflow_id)
+                except Exception as e:
+                    print(f"❌ Could not load workflow: {e}")
+                    return False, []
         
         steps = full_workflow.get('steps', [])
         semantic_actions = full_workflow.get('semantic_actions', [])
@@ -320,6 +575,9 @@ class GeminiWorkflowExecutor:
             # Show stats
             successful_steps = sum(1 for r in self.execution_results if r['success'])
             print(f"\nSteps: {successful_steps}/{len(self.execution_results)} successful")
+            vision_cache = self.gemini.vision_cache
+            if vision_cache is not None and vision_cache.hits:
+                print(f"Vision calls saved by cache: {vision_cache.hits}")
         
         # Increment usage counter
         if all_success:
@@ -485,7 +743,7 @@ class GeminiWorkflowExecutor:
             else:
                 descriptions.append(f"- {action_type}")
         
-        return "Recorded workflow pattern:\n" + "\n".join(descriptions)
+        return "\n".join(["Recorded workflow pattern:", *descriptions])
     
     def _execute_with_gemini_planning(self,
                                      user_request: str,
@@ -500,7 +758,6 @@ class GeminiWorkflowExecutor:
         
         # MINIMIZE TERMINAL WINDOW FIRST
         try:
-            import pyautogui
             pyautogui.hotkey('command', 'm')  # Minimize current window
             time.sleep(0.5)
             if self.verbose:
@@ -510,78 +767,21 @@ class GeminiWorkflowExecutor:
         
         # Capture current screen
         try:
-            screenshot = np.array(pyautogui.screenshot())
+            screenshot = capture_screen()
         except Exception as e:
             print(f"❌ Could not capture screenshot: {e}")
             return False
         
-        # Build prompt for Gemini to plan actions
-        planning_prompt = f"""You are a HIGH-AGENCY, HIGH-AUTONOMY automation assistant with MAXIMUM INCENTIVE to complete the user's goal. The user wants to: "{user_request}"
-
-CONTEXT: Here's a similar workflow that was recorded before:
-{context_description}
-
-CURRENT SCREEN: I'll provide a screenshot of the current screen.
-
-🎯 YOUR MISSION: Complete the user's request with MAXIMUM AGENCY and ROBUSTNESS.
-
-⚠️  CRITICAL: DO NOT blindly copy the recorded workflow steps! 
-- The recorded workflow is CONTEXT to understand the GOAL, not a template to copy
-- Plan actions based on CURRENT SCREEN STATE, not recorded steps
-- Only include actions that make sense for the CURRENT situation
-- Don't include scroll actions if you're not even on the target page yet
-- Don't include course-specific actions if you haven't navigated to the course yet
-
-CORE PRINCIPLES:
-1. **HIGH AGENCY**: Take initiative, don't wait for perfect conditions
-2. **HIGH ROBUSTNESS**: Use multiple strategies, keyboard shortcuts preferred over mouse
-3. **HIGH AUTONOMY**: Self-correct when stuck, try alternative approaches
-4. **HIGH INCENTIVE**: You MUST complete the user's goal - failure is not an option
-5. **ADAPTIVE**: If something doesn't work, immediately try a different approach
-6. **CONTEXT-AWARE**: Plan based on current screen, not recorded steps
-
-STRATEGY HIERARCHY (in order of preference):
-1. **KEYBOARD SHORTCUTS** (most reliable) - Cmd+T, Cmd+L, Tab, Enter, etc.
-2. **Direct typing** with Tab navigation
-3. **Smart clicking** with multiple fallback descriptions
-4. **Scroll and search** to find elements
-5. **Alternative approaches** if primary fails
-
-ESCAPE STRATEGIES when stuck:
-- Take a new screenshot and re-analyze
-- Try keyboard shortcuts (Cmd+T for new tab, Cmd+L for address bar)
-- Use Tab to navigate between elements
-- Try different element descriptions
-- Scroll to find hidden elements
-- Use search functionality if available
-
-Return a JSON array of ROBUST actions:
-[
-    {{
-        "action_type": "open_application" | "click" | "type" | "scroll" | "navigate" | "wait" | "keyboard_shortcut" | "tab_navigate" | "search",
-        "target": "what to interact with (for click/open_application)",
-        "value": "text to type (for type) or key name (for key) or wait seconds (for wait)",
-        "description": "human-readable description of this step",
-        "fallback_strategies": ["alternative approach 1", "alternative approach 2"],
-        "priority": "high" | "medium" | "low"
-    }},
-    ...
-]
-
-CRITICAL RULES:
-- ALWAYS prefer keyboard shortcuts over mouse clicks
-- Use Cmd+L for address bar, Cmd+T for new tabs
-- Try multiple element descriptions if clicking fails
-- If stuck, take screenshot and re-analyze
-- NEVER give up - try alternative approaches
-- Focus on the user's SPECIFIC goal (e.g., "Machine Learning" not generic courses)
-- Be AGGRESSIVE in completing the task
-- PLAN BASED ON CURRENT SCREEN, NOT RECORDED STEPS
-"""
+        # Build prompt for Gemini to plan actions (joined once; parameters
+        # are only serialized when there are any)
+        prompt_parts = [_PLANNING_PROMPT_INTRO, user_request, '"\n\n', _PLANNING_PROMPT_CONTEXT, context_description, '\n']
+        if parameters:
+            prompt_parts += ['\nPARAMETERS (use these exact values):\n', json.dumps(parameters, indent=2), '\n']
+        prompt_parts.append(_PLANNING_PROMPT_BODY)
+        planning_prompt = ''.join(prompt_parts)
         
         try:
             # Use Gemini to plan actions
-            from google.genai.types import GenerateContentConfig
             response = self.gemini.client.models.generate_content(
                 model="gemini-2.0-flash",
                 contents=[
@@ -591,29 +791,22 @@ CRITICAL RULES:
                             {"text": planning_prompt},
                             {
                                 "inline_data": {
-                                    "mime_type": "image/png",
+                                    "mime_type": self.gemini.screenshot_mime_type,
                                     "data": self.gemini._encode_screenshot(screenshot)
                                 }
                             }
                         ]
                     }
                 ],
-                config=GenerateContentConfig(
-                    temperature=0.1,
-                    max_output_tokens=2048
-                )
+                config=get_generation_config(temperature=0.1, max_output_tokens=2048)
             )
             
             content = response.text
             
             # Extract JSON from response
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+            content = extract_json_text(content)
             
-            import json
-            actions = json.loads(content)
+            actions = _loads_json(content)
             
             if not isinstance(actions, list) or not actions:
                 print("❌ Could not generate action plan")
@@ -631,8 +824,7 @@ CRITICAL RULES:
             
         except Exception as e:
             print(f"❌ Planning failed: {e}")
-            import traceback
-            traceback.print_exc()
+            debug_traceback(e)
             return False
     
     def _execute_planned_actions_with_intelligence(self, actions: List[Dict], confirm_steps: bool = False) -> bool:
@@ -699,15 +891,32 @@ CRITICAL RULES:
             
             # Check if we've made significant progress and should re-plan
             should_replan = self._should_replan_after_action(current_action_index, actions)
+            verify = current_action_index > 0  # Don't check after first action
+            
+            # Re-planning and completion verification look at the same
+            # screen: capture and encode it once, and send the verification
+            # request in the background while re-planning
+            screenshot_data = None
+            verification_future = None
+            if should_replan or verify:
+                try:
+                    screenshot_data = self.gemini._encode_screenshot(capture_screen())
+                except Exception as e:
+                    if self.verbose:
+                        print(f"   ⚠️  Could not capture screen: {e}")
+            if verify and screenshot_data is not None:
+                verification_future = self._request_pool.submit(
+                    self._request_verification, self._get_user_request_from_context(None), screenshot_data
+                )
             
             if should_replan:
                 if self.verbose:
                     print(f"   🧠 Significant progress detected - re-planning next steps...")
                 
-                # Take new screenshot and re-plan remaining actions
+                # Re-plan remaining actions from the new screenshot
                 try:
-                    import pyautogui
-                    screenshot = np.array(pyautogui.screenshot())
+                    if screenshot_data is None:
+                        screenshot_data = self.gemini._encode_screenshot(capture_screen())
                     
                     # Ask Gemini: "What should I do next based on current state?"
                     replan_prompt = f"""I was executing a workflow to: "{self._get_user_request_from_context(None)}"
@@ -732,7 +941,6 @@ Return JSON with next actions:
 
 Focus on what makes sense for the CURRENT screen, not the original plan."""
 
-                    from google.genai.types import GenerateContentConfig
                     response = self.gemini.client.models.generate_content(
                         model="gemini-2.0-flash",
                         contents=[
@@ -742,26 +950,20 @@ Focus on what makes sense for the CURRENT screen, not the original plan."""
                                     {"text": replan_prompt},
                                     {
                                         "inline_data": {
-                                            "mime_type": "image/png",
-                                            "data": self.gemini._encode_screenshot(screenshot)
+                                            "mime_type": self.gemini.screenshot_mime_type,
+                                            "data": screenshot_data
                                         }
                                     }
                                 ]
                             }
                         ],
-                        config=GenerateContentConfig(
-                            temperature=0.1,
-                            max_output_tokens=1024
-                        )
+                        config=get_generation_config(temperature=0.1, max_output_tokens=1024)
                     )
                     
                     content = response.text
-                    if "```json" in content:
-                        content = content.split("```json")[1].split("```")[0].strip()
-                    elif "```" in content:
-                        content = content.split("```")[1].split("```")[0].strip()
+                    content = extract_json_text(content)
                     
-                    replan = json.loads(content)
+                    replan = _loads_json(content)
                     
                     if self.verbose:
                         print(f"   📊 Progress: {replan.get('current_progress', 'Unknown')}")
@@ -775,8 +977,13 @@ Focus on what makes sense for the CURRENT screen, not the original plan."""
                         print(f"   ⚠️  Re-planning failed: {e}, continuing with original plan")
             
             # TASK COMPLETION VERIFICATION: Check if we've actually completed the user's request
-            if current_action_index > 0:  # Don't check after first action
-                task_complete = self._verify_task_completion(self._get_user_request_from_context(None))
+            if verify:
+                if verification_future is not None:
+                    task_complete = self._report_verification(
+                        self._get_user_request_from_context(None), verification_future.result()
+                    )
+                else:
+                    task_complete = self._verify_task_completion(self._get_user_request_from_context(None))
                 
                 if task_complete:
                     if self.verbose:
@@ -801,7 +1008,19 @@ Focus on what makes sense for the CURRENT screen, not the original plan."""
             if self.verbose:
                 print(f"\n🔍 TASK VERIFICATION (Attempt {attempt + 1}/{max_attempts})...")
             
-            task_complete = self._verify_task_completion(self._get_user_request_from_context(None))
+            # Verification and continuation planning see the same screen, so
+            # it is captured and encoded once per attempt
+            try:
+                screenshot_data = self.gemini._encode_screenshot(capture_screen())
+            except Exception as e:
+                screenshot_data = None
+                if self.verbose:
+                    print(f"   ⚠️  Could not capture screen: {e}")
+            
+            user_request = self._get_user_request_from_context(None)
+            task_complete = self._report_verification(
+                user_request, self._request_verification(user_request, screenshot_data)
+            )
             
             if task_complete:
                 if self.verbose:
@@ -814,8 +1033,8 @@ Focus on what makes sense for the CURRENT screen, not the original plan."""
             
             # Plan more actions to complete the task
             try:
-                import pyautogui
-                screenshot = np.array(pyautogui.screenshot())
+                if screenshot_data is None:
+                    screenshot_data = self.gemini._encode_screenshot(capture_screen())
                 
                 # Ask Gemini: "What else do I need to do to complete this task?"
                 continuation_prompt = f"""The user requested: "{self._get_user_request_from_context(None)}"
@@ -841,7 +1060,6 @@ Return JSON with next actions:
 
 Focus on completing the SPECIFIC user request. Be persistent and thorough."""
 
-                from google.genai.types import GenerateContentConfig
                 response = self.gemini.client.models.generate_content(
                     model="gemini-2.0-flash",
                     contents=[
@@ -851,26 +1069,20 @@ Focus on completing the SPECIFIC user request. Be persistent and thorough."""
                                 {"text": continuation_prompt},
                                 {
                                     "inline_data": {
-                                        "mime_type": "image/png",
-                                        "data": self.gemini._encode_screenshot(screenshot)
+                                        "mime_type": self.gemini.screenshot_mime_type,
+                                        "data": screenshot_data
                                     }
                                 }
                             ]
                         }
                     ],
-                    config=GenerateContentConfig(
-                        temperature=0.1,
-                        max_output_tokens=1024
-                    )
+                    config=get_generation_config(temperature=0.1, max_output_tokens=1024)
                 )
                 
                 content = response.text
-                if "```json" in content:
-                    content = content.split("```json")[1].split("```")[0].strip()
-                elif "```" in content:
-                    content = content.split("```")[1].split("```")[0].strip()
+                content = extract_json_text(content)
                 
-                continuation = json.loads(content)
+                continuation = _loads_json(content)
                 
                 if self.verbose:
                     print(f"   📊 Progress: {continuation.get('current_progress', 'Unknown')}")
@@ -930,7 +1142,7 @@ Focus on completing the SPECIFIC user request. Be persistent and thorough."""
             action_type = action.get('action_type', '')
             
             # Re-plan after navigation, app opening, or major state changes
-            if action_type in ['navigate', 'open_application', 'keyboard_shortcut']:
+            if action_type in {'navigate', 'open_application', 'keyboard_shortcut'}:
                 return True
             
             # Re-plan every 3 actions to stay adaptive
@@ -944,15 +1156,24 @@ Focus on completing the SPECIFIC user request. Be persistent and thorough."""
         VERIFY TASK COMPLETION: Check if we've actually completed the user's request.
         This prevents the agent from stopping too early.
         """
+        return self._report_verification(user_request, self._request_verification(user_request))
+    
+    def _request_verification(self, user_request: str, screenshot_data: str = None) -> Dict:
+        """
+        Ask Gemini whether the current screen satisfies the user's request.
+        Prints nothing, so it can run in the background.
+        
+        Args:
+            user_request: The user's request
+            screenshot_data: Encoded screenshot (captured now if not given)
+        
+        Returns:
+            Gemini's verification JSON, or {'error': message} on failure
+        """
         try:
-            import pyautogui
-            
-            if self.verbose:
-                print(f"\n🔍 VERIFYING TASK COMPLETION: '{user_request}'")
-                print(f"   📸 Taking screenshot to verify...")
-            
             # Take screenshot to verify completion
-            screenshot = np.array(pyautogui.screenshot())
+            if screenshot_data is None:
+                screenshot_data = self.gemini._encode_screenshot(capture_screen())
             
             # Ask Gemini to verify if task is complete
             verification_prompt = f"""The user requested: "{user_request}"
@@ -974,7 +1195,6 @@ Return JSON:
 
 Be STRICT - only mark complete if the user's specific request is fully satisfied."""
 
-            from google.genai.types import GenerateContentConfig
             response = self.gemini.client.models.generate_content(
                 model="gemini-2.0-flash",
                 contents=[
@@ -984,40 +1204,42 @@ Be STRICT - only mark complete if the user's specific request is fully satisfied
                             {"text": verification_prompt},
                             {
                                 "inline_data": {
-                                    "mime_type": "image/png",
-                                    "data": self.gemini._encode_screenshot(screenshot)
+                                    "mime_type": self.gemini.screenshot_mime_type,
+                                    "data": screenshot_data
                                 }
                             }
                         ]
                     }
                 ],
-                config=GenerateContentConfig(
-                    temperature=0.1,
-                    max_output_tokens=512
-                )
+                config=get_generation_config(temperature=0.1, max_output_tokens=512)
             )
             
             content = response.text
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            verification = json.loads(content)
+            content = extract_json_text(content)
             
-            if self.verbose:
-                print(f"   📊 Current State: {verification.get('current_state', 'Unknown')}")
-                print(f"   ✅ Task Complete: {verification.get('task_complete', False)}")
-                if not verification.get('task_complete', False):
-                    print(f"   ⚠️  Missing Steps: {verification.get('missing_steps', [])}")
-                print(f"   🔍 Evidence: {verification.get('verification_evidence', 'N/A')}")
-            
-            return verification.get('task_complete', False)
+            return _loads_json(content)
             
         except Exception as e:
+            return {'error': str(e)}
+    
+    def _report_verification(self, user_request: str, verification: Dict) -> bool:
+        """Print a verification result; returns whether the task is complete"""
+        if self.verbose:
+            print(f"\n🔍 VERIFYING TASK COMPLETION: '{user_request}'")
+        
+        if 'error' in verification:
             if self.verbose:
-                print(f"   ❌ Verification failed: {e}")
+                print(f"   ❌ Verification failed: {verification['error']}")
             return False  # If we can't verify, assume not complete
+        
+        if self.verbose:
+            print(f"   📊 Current State: {verification.get('current_state', 'Unknown')}")
+            print(f"   ✅ Task Complete: {verification.get('task_complete', False)}")
+            if not verification.get('task_complete', False):
+                print(f"   ⚠️  Missing Steps: {verification.get('missing_steps', [])}")
+            print(f"   🔍 Evidence: {verification.get('verification_evidence', 'N/A')}")
+        
+        return verification.get('task_complete', False)
     
     def _execute_planned_actions(self, actions: List[Dict], confirm_steps: bool = False) -> bool:
         """Execute the planned actions"""
@@ -1102,7 +1324,7 @@ Be STRICT - only mark complete if the user's specific request is fully satisfied
             return success, result
         
         # If primary failed and it's a high priority action, use ADAPTIVE RE-PLANNING
-        if priority == 'high' and action_type in ['click', 'type', 'navigate']:
+        if priority == 'high' and action_type in {'click', 'type', 'navigate'}:
             if self.verbose:
                 print(f"🧠 HIGH PRIORITY FAILED - Using ADAPTIVE RE-PLANNING")
             
@@ -1154,17 +1376,15 @@ Be STRICT - only mark complete if the user's specific request is fully satisfied
         Returns True if cursor state is good, False if needs correction.
         """
         # Only check for actions that need specific cursor state
-        if action_type not in ['type', 'navigate', 'click']:
+        if action_type not in {'type', 'navigate', 'click'}:
             return True
         
         try:
-            import pyautogui
-            
             if self.verbose:
                 print(f"   🔍 Proactive cursor check for {action_type}...")
             
             # Take quick screenshot
-            screenshot = np.array(pyautogui.screenshot())
+            screenshot = capture_screen()
             
             # Quick check prompt
             check_prompt = f"""I'm about to: {action_type} "{target or value}"
@@ -1180,7 +1400,6 @@ Answer briefly:
 }}
 """
             
-            from google.genai.types import GenerateContentConfig
             response = self.gemini.client.models.generate_content(
                 model="gemini-2.0-flash",
                 contents=[
@@ -1190,21 +1409,17 @@ Answer briefly:
                             {"text": check_prompt},
                             {
                                 "inline_data": {
-                                    "mime_type": "image/png",
+                                    "mime_type": self.gemini.screenshot_mime_type,
                                     "data": self.gemini._encode_screenshot(screenshot)
                                 }
                             }
                         ]
                     }
                 ],
-                config=GenerateContentConfig(
-                    temperature=0.1,
-                    max_output_tokens=256,
-                    response_mime_type="application/json"
-                )
+                config=get_generation_config(temperature=0.1, max_output_tokens=256, response_mime_type="application/json")
             )
             
-            check = json.loads(response.text)
+            check = _loads_json(response.text)
             
             if check.get('cursor_ready'):
                 if self.verbose:
@@ -1235,7 +1450,7 @@ Answer briefly:
         """Execute action with robustness and PROACTIVE CURSOR CHECKING"""
         try:
             # PROACTIVE: Check cursor state before critical actions
-            if action_type in ['type', 'navigate', 'click']:
+            if action_type in {'type', 'navigate', 'click'}:
                 cursor_ok = self._check_cursor_state_before_action(action_type, target, value)
                 if not cursor_ok and self.verbose:
                     print(f"   ⚠️  Cursor not ideal but continuing...")
@@ -1279,6 +1494,13 @@ Answer briefly:
             if self.verbose:
                 print(f"❌ Action execution error: {e}")
             return False
+        finally:
+            self._after_action(action_type)
+    
+    def _after_action(self, action_type: str):
+        """Drop the vision cache after input the fingerprint may not notice"""
+        if action_type in _INPUT_ACTION_TYPES and self.gemini.vision_cache is not None:
+            self.gemini.vision_cache.invalidate()
     
     def _execute_keyboard_shortcut(self, shortcut: str) -> bool:
         """Execute keyboard shortcuts with high reliability"""
@@ -1286,31 +1508,9 @@ Answer briefly:
             print(f"⌨️  Executing keyboard shortcut: {shortcut}")
         
         try:
-            import pyautogui
-            
-            # Map common shortcuts
-            shortcuts = {
-                'cmd+l': ['command', 'l'],
-                'cmd+t': ['command', 't'],
-                'cmd+r': ['command', 'r'],
-                'cmd+w': ['command', 'w'],
-                'cmd+shift+t': ['command', 'shift', 't'],
-                'tab': ['tab'],
-                'enter': ['enter'],
-                'escape': ['escape'],
-                'cmd+shift+n': ['command', 'shift', 'n']
-            }
-            
-            if shortcut.lower() in shortcuts:
-                pyautogui.hotkey(*shortcuts[shortcut.lower()])
-                time.sleep(0.5)
-                return True
-            else:
-                # Try to parse as key combination
-                keys = shortcut.lower().split('+')
-                pyautogui.hotkey(*keys)
-                time.sleep(0.5)
-                return True
+            pyautogui.hotkey(*_parse_shortcut(shortcut))
+            time.sleep(0.5)
+            return True
                 
         except Exception as e:
             if self.verbose:
@@ -1328,10 +1528,6 @@ Answer briefly:
         Returns:
             True if successful
         """
-        import pyautogui
-        import json
-        import os
-        
         workflow_file = action.get('target')
         parameter_mappings = action.get('parameter_mappings', {})
         
@@ -1355,8 +1551,8 @@ Answer briefly:
         
         try:
             # Load recorded workflow
-            with open(workflow_file, 'r') as f:
-                workflow = json.load(f)
+            with open(workflow_file, 'rb') as f:
+                workflow = _loads_json(f.read())
             
             if self.verbose:
                 print(f"🎬 Playing recorded workflow: {workflow.get('name', 'unnamed')}")
@@ -1385,7 +1581,7 @@ Answer briefly:
                     text = recorded_action['text']
                     if self.verbose:
                         print(f"   [{i}/{len(workflow['actions'])}] ⌨️  Type '{text}'")
-                    pyautogui.write(text, interval=0.05)
+                    enter_text(text)
                 
                 elif action_type == 'key':
                     key = recorded_action['key']
@@ -1402,7 +1598,7 @@ Answer briefly:
                         param_value = parameters[param_name]
                         if self.verbose:
                             print(f"   [{i}/{len(workflow['actions'])}] 📝 Type parameter {{{placeholder}}}: '{param_value}'")
-                        pyautogui.write(param_value, interval=0.05)
+                        enter_text(param_value)
                     else:
                         if self.verbose:
                             print(f"   [{i}/{len(workflow['actions'])}] ⚠️  Missing parameter: {placeholder}")
@@ -1416,8 +1612,7 @@ Answer briefly:
         except Exception as e:
             if self.verbose:
                 print(f"❌ Recorded workflow failed: {e}")
-                import traceback
-                traceback.print_exc()
+                debug_traceback(e)
             return False
     
     def _execute_tab_navigate(self, target: str) -> bool:
@@ -1426,8 +1621,6 @@ Answer briefly:
             print(f"🔍 Tab navigating to find: {target}")
         
         try:
-            import pyautogui
-            
             # Try multiple Tab presses to find the element
             for i in range(10):  # Try up to 10 tabs
                 pyautogui.press('tab')
@@ -1452,14 +1645,12 @@ Answer briefly:
             print(f"🔍 Searching for: {target}")
         
         try:
-            import pyautogui
-            
             # Try Cmd+F to open search
             pyautogui.hotkey('command', 'f')
             time.sleep(0.5)
             
             # Type search term
-            pyautogui.write(value or target, interval=0.05)
+            enter_text(value or target)
             time.sleep(0.5)
             
             # Press Enter to search
@@ -1541,8 +1732,6 @@ Answer briefly:
         Much more reliable than clicking for many interfaces.
         """
         try:
-            import pyautogui
-            
             if self.verbose:
                 print(f"      ⌨️  Using keyboard navigation for: {target}")
             
@@ -1581,8 +1770,6 @@ Answer briefly:
         Very reliable for text-based targets.
         """
         try:
-            import pyautogui
-            
             if self.verbose:
                 print(f"      🔍 Using search for: {target}")
             
@@ -1597,7 +1784,7 @@ Answer briefly:
             time.sleep(0.1)
             
             # Type search term
-            pyautogui.write(target, interval=0.05)
+            enter_text(target)
             time.sleep(0.5)
             
             # Press Enter to search
@@ -1624,17 +1811,11 @@ Answer briefly:
         Highest accuracy method.
         """
         try:
-            import pyautogui
-            
             if self.verbose:
                 print(f"      📍 Getting coordinates for: {target}")
             
             # Use Gemini to get exact coordinates
-            screenshot = np.array(pyautogui.screenshot())
-            
-            # Calculate scaling factor for Retina/HiDPI displays
-            from gemini_computer_use import GeminiComputerUse
-            scale_x, scale_y = GeminiComputerUse.get_screen_scaling(screenshot)
+            screenshot = capture_screen()
             
             coordinate_prompt = f"""Find the exact BOUNDING BOX for: "{target}"
 
@@ -1659,7 +1840,6 @@ If not found, return: {{"found": false}}
 Example: Button at top-center
 {{"found": true, "bbox": {{"x1": 450, "y1": 40, "x2": 550, "y2": 80}}}}"""
 
-            from google.genai.types import GenerateContentConfig
             response = self.gemini.client.models.generate_content(
                 model="gemini-2.0-flash",
                 contents=[
@@ -1669,29 +1849,23 @@ Example: Button at top-center
                             {"text": coordinate_prompt},
                             {
                                 "inline_data": {
-                                    "mime_type": "image/png",
+                                    "mime_type": self.gemini.screenshot_mime_type,
                                     "data": self.gemini._encode_screenshot(screenshot)
                                 }
                             }
                         ]
                     }
                 ],
-                config=GenerateContentConfig(
-                    temperature=0.1,
-                    max_output_tokens=50
-                )
+                config=get_generation_config(temperature=0.1, max_output_tokens=50)
             )
             
             content = response.text.strip()
             
             # Extract JSON
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+            content = extract_json_text(content)
             
             try:
-                result = json.loads(content)
+                result = _loads_json(content)
                 
                 if not result.get('found', False):
                     if self.verbose:
@@ -1710,7 +1884,6 @@ Example: Button at top-center
                 center_y = (y1 + y2) // 2
                 
                 # Convert from normalized (0-999) to actual screen pixels
-                from gemini_computer_use import GeminiComputerUse
                 screen_size = pyautogui.size()
                 click_x, click_y = GeminiComputerUse.denormalize_coordinates(
                     center_x, center_y,
@@ -1748,8 +1921,6 @@ Example: Button at top-center
         This is the INTELLIGENCE that normal computer use agents have.
         """
         try:
-            import pyautogui
-            
             if self.verbose:
                 print(f"   🧠 Taking fresh screenshot and analyzing situation...")
             
@@ -1757,7 +1928,7 @@ Example: Button at top-center
             time.sleep(2.0)
             
             # Fresh screenshot
-            screenshot = np.array(pyautogui.screenshot())
+            screenshot = capture_screen()
             
             # Ask Gemini for help
             replan_prompt = f"""I was trying to: "{description}"
@@ -1801,7 +1972,6 @@ CURSOR AWARENESS IS CRITICAL! Consider:
 
 HELP ME RECOVER and complete the task!"""
 
-            from google.genai.types import GenerateContentConfig
             response = self.gemini.client.models.generate_content(
                 model="gemini-2.0-flash",
                 contents=[
@@ -1811,28 +1981,22 @@ HELP ME RECOVER and complete the task!"""
                             {"text": replan_prompt},
                             {
                                 "inline_data": {
-                                    "mime_type": "image/png",
+                                    "mime_type": self.gemini.screenshot_mime_type,
                                     "data": self.gemini._encode_screenshot(screenshot)
                                 }
                             }
                         ]
                     }
                 ],
-                config=GenerateContentConfig(
-                    temperature=0.2,
-                    max_output_tokens=1024
-                )
+                config=get_generation_config(temperature=0.2, max_output_tokens=1024)
             )
             
             content = response.text
             
             # Extract JSON
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+            content = extract_json_text(content)
             
-            recovery = json.loads(content)
+            recovery = _loads_json(content)
             
             if self.verbose:
                 print(f"\n🧠 ADAPTIVE INTELLIGENCE:")
@@ -1881,8 +2045,7 @@ HELP ME RECOVER and complete the task!"""
         except Exception as e:
             if self.verbose:
                 print(f"❌ Adaptive re-planning error: {e}")
-                import traceback
-                traceback.print_exc()
+                debug_traceback(e)
             return False
     
     def _adaptive_replan_for_click(self, target: str, original_action: Dict) -> bool:
@@ -1891,15 +2054,13 @@ HELP ME RECOVER and complete the task!"""
         This is what makes the agent INTELLIGENT like a normal computer use agent.
         """
         try:
-            import pyautogui
-            
             # Wait a moment for page to stabilize
             if self.verbose:
                 print(f"   ⏱️  Waiting 2s for page to stabilize...")
             time.sleep(2.0)
             
             # Take FRESH screenshot
-            screenshot = np.array(pyautogui.screenshot())
+            screenshot = capture_screen()
             
             # Ask Gemini: "What should I do now?"
             replan_prompt = f"""I was trying to click on "{target}" but I couldn't find it on the screen.
@@ -1941,7 +2102,6 @@ Return a JSON object with CURSOR-AWARE analysis:
 CURSOR AWARENESS IS KEY! If wrong app has focus, suggest switching apps first.
 BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it."""
 
-            from google.genai.types import GenerateContentConfig
             response = self.gemini.client.models.generate_content(
                 model="gemini-2.0-flash",
                 contents=[
@@ -1951,28 +2111,22 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
                             {"text": replan_prompt},
                             {
                                 "inline_data": {
-                                    "mime_type": "image/png",
+                                    "mime_type": self.gemini.screenshot_mime_type,
                                     "data": self.gemini._encode_screenshot(screenshot)
                                 }
                             }
                         ]
                     }
                 ],
-                config=GenerateContentConfig(
-                    temperature=0.1,
-                    max_output_tokens=1024
-                )
+                config=get_generation_config(temperature=0.1, max_output_tokens=1024)
             )
             
             content = response.text
             
             # Extract JSON
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+            content = extract_json_text(content)
             
-            analysis = json.loads(content)
+            analysis = _loads_json(content)
             
             if self.verbose:
                 print(f"\n🧠 GEMINI ANALYSIS:")
@@ -2016,7 +2170,6 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
                     print(f"🔄 Switching to app: {app_name}")
                 
                 # Use Cmd+Tab or open the app
-                import pyautogui
                 if app_name:
                     # Try to switch using app name
                     pyautogui.hotkey('command', 'tab')
@@ -2075,8 +2228,7 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
         except Exception as e:
             if self.verbose:
                 print(f"❌ Adaptive re-planning failed: {e}")
-                import traceback
-                traceback.print_exc()
+                debug_traceback(e)
             
             # Fallback: try variations as before
             if self.verbose:
@@ -2118,22 +2270,20 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
         
         # Strategy 3: Direct typing with field clearing
         try:
-            import pyautogui
             # Clear field first
             pyautogui.hotkey('command', 'a')  # Select all
             time.sleep(0.1)
             pyautogui.press('delete')  # Delete selected
             time.sleep(0.1)
             # Type new value
-            pyautogui.write(value, interval=0.05)
+            enter_text(value)
             return True
         except:
             return False
     
     def _is_url(self, text: str) -> bool:
         """Check if text looks like a URL"""
-        url_indicators = ['http', 'www.', '.com', '.edu', '.org', '.net', '.io']
-        return any(indicator in text.lower() for indicator in url_indicators)
+        return _URL_INDICATOR_RE.search(text) is not None
     
     def _clear_and_type_url(self, url: str, target: str) -> bool:
         """Clear field and type URL with maximum resilience"""
@@ -2141,8 +2291,6 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
             print(f"   🧹 Clearing field and typing URL: {url}")
         
         try:
-            import pyautogui
-            
             # Strategy 1: Use Cmd+L to focus address bar and clear
             pyautogui.hotkey('command', 'l')
             time.sleep(0.3)
@@ -2150,7 +2298,7 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
             time.sleep(0.1)
             pyautogui.press('delete')  # Delete
             time.sleep(0.1)
-            pyautogui.write(url, interval=0.05)
+            enter_text(url)
             return True
             
         except Exception as e:
@@ -2181,12 +2329,11 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
             print(f"   💪 NEVER GIVE UP - TRYING ALL ESCAPE STRATEGIES...")
         
         try:
-            import pyautogui
-            
-            # Emergency Strategy 1: Take new screenshot and re-analyze
+            # Emergency Strategy 1: Make sure the screen can still be captured
+            # (the pixels aren't used here, so a 1x1 region is enough)
             if self.verbose:
-                print(f"   📸 Taking new screenshot for re-analysis...")
-            screenshot = np.array(pyautogui.screenshot())
+                print(f"   📸 Checking screen capture...")
+            pyautogui.screenshot(region=(0, 0, 1, 1))
             
             # Emergency Strategy 2: Open new tab and start fresh
             if self.verbose:
@@ -2307,30 +2454,9 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
             action_with_params = self._apply_parameters(action, parameters)
             
             # Execute based on semantic type
-            if semantic_type == 'open_application':
-                success = self._execute_open_application(action_with_params)
-            
-            elif semantic_type == 'click_element':
-                success = self._execute_click_element(action_with_params)
-            
-            elif semantic_type == 'type_text':
-                success = self._execute_type_text(action_with_params)
-            
-            elif semantic_type == 'scroll':
-                success = self._execute_scroll_semantic(action_with_params)
-
-            elif semantic_type == 'navigate':
-                success = self._execute_navigate(action_with_params)
-
-            elif semantic_type == 'wait':
-                success = self._execute_wait(action_with_params)
-            
-            elif semantic_type == 'keyboard_shortcut':
-                shortcut = action_with_params.get('value')
-                success = self._execute_keyboard_shortcut(shortcut)
-            
-            elif semantic_type == 'use_recorded_workflow':
-                success = self._execute_recorded_workflow(action_with_params, parameters)
+            handler = self._semantic_handlers.get(semantic_type)
+            if handler is not None:
+                success = handler(action_with_params, parameters)
 
             else:
                 if self.verbose:
@@ -2347,6 +2473,7 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
                 print(f"❌ Execution error: {e}")
             success = False
         
+        self._after_action(semantic_type)
         return success, result
     
     def _apply_parameters(self, action: Dict, parameters: Dict[str, str] = None) -> Dict:
@@ -2399,9 +2526,6 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
         if self.verbose:
             print(f"🚀 Opening application: {app_name}")
         
-        import pyautogui
-        
-        
         # Type app name with longer interval for reliability
         if self.verbose:
             print(f"   ⌨️  Typing: {app_name}")
@@ -2412,10 +2536,11 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
         if self.verbose:
             print(f"   ⏎ Pressing Enter to launch...")
         pyautogui.press('enter')
-        time.sleep(3.0)  # Wait for app to fully open and become active
+        # Wait for the app to become active (up to the old fixed 3s)
+        self.wait_for_app_frontmost(app_name, timeout=3.0)
         
         # Force focus to the new application
-        if app_name.lower() in ['brave browser', 'brave', 'chrome', 'safari']:
+        if app_name.lower() in {'brave browser', 'brave', 'chrome', 'safari'}:
             # For browsers, try to click on the address bar area to ensure focus
             try:
                 if self.verbose:
@@ -2444,11 +2569,9 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
                 print(f"   Description: {description}")
 
             # Try to extract quoted text from description
-            import re
             # Look for patterns like "clicked on 'X'" or 'clicked "Y"'
-            matches = re.findall(r"'([^']+)'|\"([^\"]+)\"", description)
-            if matches:
-                target = matches[0][0] or matches[0][1]
+            target = _first_quoted(description)
+            if target:
                 if self.verbose:
                     print(f"   ✓ Inferred target: '{target}'")
 
@@ -2479,10 +2602,7 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
         if not text:
             description = action.get('description', '')
             # Look for text in quotes in the description
-            import re
-            matches = re.findall(r"'([^']+)'|\"([^\"]+)\"", description)
-            if matches:
-                text = matches[0][0] or matches[0][1]
+            text = _first_quoted(description)
 
         if not text:
             if self.verbose:
@@ -2504,8 +2624,7 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
             return self.gemini.type_text(text, target=target_field)
         else:
             # Just type directly
-            import pyautogui
-            pyautogui.write(text, interval=0.05)
+            enter_text(text)
             return True
     
     def _execute_scroll_semantic(self, action: Dict) -> bool:
@@ -2527,8 +2646,6 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
             print(f"   💪 MAXIMUM DETERMINATION - MUST SUCCEED")
 
         try:
-            import pyautogui
-            
             # Strategy 1: Ensure we're in the right field
             if self.verbose:
                 print(f"   🎯 Ensuring focus on address bar...")
@@ -2543,7 +2660,7 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
                 time.sleep(0.1)
                 pyautogui.press('delete')
                 time.sleep(0.1)
-                pyautogui.write(value, interval=0.05)
+                enter_text(value)
                 time.sleep(0.5)
             
             # Strategy 3: Press Enter with multiple attempts
@@ -2576,7 +2693,6 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
 
         # If there's a value (URL), assume we already typed it and just press Enter
         if value or target == "address bar":
-            import pyautogui
             time.sleep(0.3)
             pyautogui.press('enter')
             time.sleep(1.5)  # Wait for page to load
@@ -2585,7 +2701,6 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
             return True
 
         # Otherwise, just press Enter
-        import pyautogui
         pyautogui.press('enter')
         time.sleep(1.0)
         if self.verbose:
@@ -2602,6 +2717,98 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
         time.sleep(duration)
         return True
 
+    def _execute_wait_until(self, action: Dict) -> bool:
+        """
+        Execute: wait_until - poll a readiness condition instead of a fixed sleep
+
+        Action fields:
+            condition: 'app_frontmost' or 'url_contains'
+            value: App name / URL substring to wait for
+            target: Browser to read the URL from (url_contains, default Brave Browser)
+            timeout: Max seconds to wait (default 5.0)
+            poll_interval: Seconds between checks (default 0.1)
+        """
+        condition = action.get('condition', 'app_frontmost')
+        expected = str(action.get('value') or '').lower()
+        timeout = float(action.get('timeout', 5.0))
+        poll_interval = float(action.get('poll_interval', 0.1))
+
+        if condition == 'app_frontmost':
+            check = lambda: expected in self._get_frontmost_app().lower()
+        elif condition == 'url_contains':
+            browser = action.get('target') or 'Brave Browser'
+            check = lambda: expected in self._get_browser_url(browser).lower()
+        else:
+            if self.verbose:
+                print(f"⚠️  Unknown wait condition: {condition}, waiting {timeout}s")
+            time.sleep(timeout)
+            return True
+
+        if self.verbose:
+            print(f"⏱️  Waiting up to {timeout}s for {condition}: '{expected}'...")
+
+        start = time.monotonic()
+        if self._poll_until(check, timeout, poll_interval):
+            if self.verbose:
+                print(f"✅ Ready after {time.monotonic() - start:.1f}s")
+            return True
+
+        # Same outcome as the old fixed wait - carry on and let later steps adapt
+        if self.verbose:
+            print(f"⚠️  Condition not confirmed after {timeout}s, continuing")
+        return True
+
+    def _poll_until(self, check, timeout: float, poll_interval: float = 0.1) -> bool:
+        """Call check() until it returns True or timeout elapses; errors count as not ready"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if check():
+                    return True
+            except Exception:
+                pass
+            time.sleep(poll_interval)
+        return False
+
+    def wait_for_app_frontmost(self, app_name: str, timeout: float = 3.0) -> bool:
+        """
+        Wait until app_name is the frontmost application.
+
+        Returns as soon as the app is active rather than always sleeping
+        the full timeout. Returns False if it never became frontmost.
+        """
+        expected = app_name.lower()
+        return self._poll_until(lambda: expected in self._get_frontmost_app().lower(), timeout)
+
+    def _get_frontmost_app(self) -> str:
+        """Name of the frontmost application (macOS), or '' if unavailable"""
+        if QUARTZ_AVAILABLE:
+            try:
+                # On-screen windows come front to back; the first normal
+                # (layer 0) window belongs to the frontmost app
+                windows = Quartz.CGWindowListCopyWindowInfo(
+                    Quartz.kCGWindowListOptionOnScreenOnly | Quartz.kCGWindowListExcludeDesktopElements,
+                    Quartz.kCGNullWindowID
+                )
+                for window in windows or ():
+                    if window.get('kCGWindowLayer') == 0:
+                        return window.get('kCGWindowOwnerName', '')
+            except Exception:
+                pass
+
+        return _run_applescript(
+            'tell application "System Events" to get name of first application process whose frontmost is true'
+        )
+
+    def _get_browser_url(self, browser: str) -> str:
+        """URL of the active tab in a browser (macOS), or '' if unavailable"""
+        if browser.lower() == 'safari':
+            script = 'tell application "Safari" to get URL of front document'
+        else:
+            # Chromium-based browsers (Brave, Chrome, Arc, ...) share this dictionary
+            script = f'tell application "{browser}" to get URL of active tab of front window'
+        return _run_applescript(script)
+
     def _execute_generic(self, action: Dict) -> bool:
         """
         Generic fallback execution - try to figure out what to do
@@ -2616,20 +2823,15 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
         # Try to infer action from description
         if 'click' in description:
             # Extract target from description
-            import re
-            matches = re.findall(r"'([^']+)'|\"([^\"]+)\"", action.get('description', ''))
-            if matches:
-                target = matches[0][0] or matches[0][1]
+            target = _first_quoted(action.get('description', ''))
+            if target:
                 return self.gemini.click(target)
 
         elif 'type' in description or 'enter' in description:
             # Extract text to type
-            import re
-            matches = re.findall(r"'([^']+)'|\"([^\"]+)\"", action.get('description', ''))
-            if matches:
-                text = matches[0][0] or matches[0][1]
-                import pyautogui
-                pyautogui.write(text, interval=0.05)
+            text = _first_quoted(action.get('description', ''))
+            if text:
+                enter_text(text)
                 return True
 
         elif 'scroll' in description:
@@ -2696,6 +2898,7 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
             print(f"❌ Step execution error: {e}")
             success = False
         
+        self._after_action(action_type)
         return success, result
     
     def _execute_click(self, 
@@ -2764,7 +2967,7 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
             return self.gemini.type_text(text_to_type, target=target_field)
         else:
             # Just type directly
-            pyautogui.write(text_to_type, interval=0.05)
+            enter_text(text_to_type)
             return True
     
     def _execute_scroll(self, action_data: Dict) -> bool:
@@ -2814,19 +3017,24 @@ BE SPECIFIC and HELPFUL. If you see the element, tell me exactly how to click it
         if not self.execution_results:
             return "No execution results available"
         
-        successful = sum(1 for r in self.execution_results if r['success'])
+        # One walk over the results: the failures give both the counts and
+        # the per-step lines
+        failed_lines = [
+            f"  Step {r['step_number']}: {r.get('error', 'Unknown error')}\n"
+            for r in self.execution_results if not r['success']
+        ]
         total = len(self.execution_results)
+        failed = len(failed_lines)
         
-        summary = f"Execution Summary:\n"
-        summary += f"  Total steps: {total}\n"
-        summary += f"  Successful: {successful}\n"
-        summary += f"  Failed: {total - successful}\n"
+        summary = (
+            f"Execution Summary:\n"
+            f"  Total steps: {total}\n"
+            f"  Successful: {total - failed}\n"
+            f"  Failed: {failed}\n"
+        )
         
-        if total - successful > 0:
-            summary += "\nFailed steps:\n"
-            for r in self.execution_results:
-                if not r['success']:
-                    summary += f"  Step {r['step_number']}: {r.get('error', 'Unknown error')}\n"
+        if failed:
+            summary += "\nFailed steps:\n" + "".join(failed_lines)
         
         return summary
 
@@ -8,8 +8,15 @@ This is the core system that enables:
 """
 
 import os
+import re
+import sys
 import json
 import time
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
 from typing import Dict, List, Tuple, Optional
 from pathlib import Path
 
@@ -18,8 +25,14 @@ import pyautogui
 from dotenv import load_dotenv
 load_dotenv()
 
-from google import genai
-from google.genai.types import GenerateContentConfig
+from google.genai.types import Content, Part
+
+# Faster JSON parsing when available
+try:
+    import orjson
+    _loads_json = orjson.loads
+except:
+    _loads_json = json.loads
 
 # Support both Snowflake and local storage
 try:
@@ -28,11 +41,190 @@ try:
 except:
     SNOWFLAKE_AVAILABLE = False
 
-from visual_memory import VisualWorkflowMemory
+from gemini_client import get_gemini_client, get_generation_config, extract_json_text, debug_traceback
+from visual_memory import VisualWorkflowMemory, print_workflow_list
 from semantic_workflow_matcher import SemanticWorkflowMatcher
 from gemini_workflow_executor import GeminiWorkflowExecutor
+from gemini_computer_use import enter_text
 from recorder import WorkflowRecorder
 
+# {placeholder} names used by template actions
+_PLACEHOLDER_RE = re.compile(r'\{(\w+)\}')
+
+# Parameter-extraction prompt; placeholders are filled with str.replace so
+# the JSON braces below need no escaping
+_PARAMETER_PROMPT = """Analyze this user request and extract relevant parameters.
+
+User Request: "{USER_REQUEST}"
+Workflow: "{WORKFLOW_NAME}"
+Description: "{WORKFLOW_DESCRIPTION}"
+{EXPECTED_PARAMETERS}
+Based on the request, extract any specific values the user wants to use.
+
+IMPORTANT: For email-related workflows, use these EXACT parameter names:
+- "recipient_email": The email address to send to
+- "email_subject": The subject line of the email
+- "email_body": The body/content of the email
+
+For other workflows, extract values like:
+- Ticket numbers (e.g., "ABC-123")
+- Company names (e.g., "Google")
+- Course names (e.g., "Machine Learning")
+- File names
+- Search terms
+- Etc.
+
+Return a JSON object with parameter names and values:
+{
+    "param_name": "value",
+    ...
+}
+
+If no parameters needed, return {}
+"""
+
+# Planning prompt for direct (no matching workflow) execution. Only the
+# user request is appended per call.
+_DIRECT_PLAN_PROMPT_HEAD = """You are a computer automation assistant.
+
+Break the user's request (given at the end) down into specific, actionable steps that can be executed on a computer.
+
+Return a JSON array of actions:
+[
+    {
+        "action_type": "open_application" | "click" | "type" | "key" | "scroll" | "wait",
+        "target": "description of what to interact with (for click/open_application)",
+        "value": "text to type (for type) or key name (for key) or wait seconds (for wait)",
+        "description": "human-readable description of this step"
+    },
+    ...
+]
+
+Rules:
+- Be specific (e.g., "Chrome browser" not just "browser")
+- For clicks, describe the element clearly (e.g., "GitHub search bar", "username field")
+- Include reasonable wait times between actions
+- Keep it simple - 3-10 steps max
+- Only include steps that are directly needed
+
+Example for "open github":
+[
+    {"action_type": "open_application", "target": "Chrome", "description": "Open web browser"},
+    {"action_type": "wait", "value": "2", "description": "Wait for browser to load"},
+    {"action_type": "click", "target": "address bar", "description": "Click address bar"},
+    {"action_type": "type", "value": "github.com", "description": "Type GitHub URL"},
+    {"action_type": "key", "value": "enter", "description": "Press Enter to navigate"}
+]
+
+CRITICAL RULES FOR macOS:
+- Apps are opened using Raycast launcher (Option + Space shortcut)
+- NEVER use target="Raycast" - Raycast is the LAUNCHER itself, not an app to open
+- For any app (Chrome, Safari, Twitter, etc.), use "open_application" with the app name
+- The system will automatically use Raycast to open it
+- Example: target="Chrome" will trigger: Option+Space → type "Chrome" → Enter
+
+Be very specific with click targets (e.g., "address bar at top of browser window")
+"""
+
+# Built once; each planning call only adds a Part for the request
+_DIRECT_PLAN_PROMPT_PART = Part(text=_DIRECT_PLAN_PROMPT_HEAD)
+
+
+def _write_text(text: str):
+    """Print a pre-built block of text with a single write"""
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+def _write_lines(lines: List[str]):
+    """Print a block of lines with a single write instead of one print per line"""
+    _write_text("\n".join(lines) + "\n")
+
+
+# Static banners, built once at import
+_SEP = "=" * 70 + "\n"
+
+_BANNER_SYSTEM_READY = (
+    _SEP + "🧠 INTELLIGENT WORKFLOW SYSTEM\n" + _SEP + "✅ All systems ready!\n"
+)
+
+_BANNER_EXECUTION_COMPLETED = _SEP + "✅ EXECUTION COMPLETED\n" + _SEP
+
+_BANNER_RECORDING_STARTED = "\n" + _SEP + "🔴 RECORDING STARTED\n" + _SEP
+
+_RECORDING_INSTRUCTIONS = (
+    "\n"
+    "📝 What to do:\n"
+    "   1. Perform your workflow now (I'm watching!)\n"
+    "   2. Click, type, navigate - do whatever you need\n"
+    "\n"
+    "⏹  When done, type: stop\n"
+    "\n"
+    + _SEP
+)
+
+_DEMO_COMMANDS_HELP = (
+    "\n"
+    "Commands:\n"
+    "  - Type a natural language request\n"
+    "  - 'list' - Show all workflows\n"
+    "  - 'record <name>' - Start recording\n"
+    "  - 'stop' - Stop recording\n"
+    "  - 'help' - Show this list\n"
+    "  - 'quit' - Exit demo mode\n"
+    "\n"
+)
+
+_BANNER_DEMO_MODE = "\n" + _SEP + "🎮 DEMO MODE\n" + _SEP + _DEMO_COMMANDS_HELP
+
+_BANNER_WELCOME = (
+    "\n" + _SEP + "🚀 INTELLIGENT WORKFLOW AUTOMATION SYSTEM\n" + _SEP +
+    "\n"
+    "Learn workflows by demonstration, then execute them with prompts!\n"
+    "\n"
+    "Examples:\n"
+    "  • 'Close Jira ticket ABC-123'\n"
+    "  • 'Download files from Canvas for Machine Learning class'\n"
+    "  • 'Fill out job application for Google'\n"
+    "\n"
+)
+
+_BANNER_READY = (
+    "\n" + _SEP +
+    "Ready! Try:\n"
+    "  system.execute_from_prompt('your request here')\n"
+    "  system.record_workflow('Workflow Name')\n"
+    "  system.demo_mode()  # Interactive mode\n"
+    + _SEP
+)
+
+
+def _normalize_request(text: str) -> str:
+    """Case/whitespace/trailing-punctuation-insensitive form of a request"""
+    return ' '.join(text.lower().split()).rstrip('.!?')
+
+
+# How often demo mode checks for background work while waiting for input
+IDLE_POLL_SECONDS = 0.5
+
+# Apps a request explicitly opens ("open Slack", "launch the Notes app") are
+# launched in the background while Gemini plans. A bare mention ("take notes",
+# "check my calendar") never launches anything.
+_SPECULATIVE_APPS = {
+    'chrome': 'Google Chrome',
+    'safari': 'Safari',
+    'brave': 'Brave Browser',
+    'firefox': 'Firefox',
+    'slack': 'Slack',
+    'spotify': 'Spotify',
+    'notes': 'Notes',
+    'calendar': 'Calendar',
+}
+_SPECULATIVE_APP_RE = re.compile(
+    r'\b(?:open|launch)\s+(?:up\s+)?(?:the\s+)?(' + '|'.join(_SPECULATIVE_APPS) + r')\b',
+    re.IGNORECASE
+)
+
 
 class IntelligentWorkflowSystem:
     """
@@ -45,13 +237,14 @@ class IntelligentWorkflowSystem:
     4. System executes: Adapted workflow using Gemini's vision
     """
     
-    def __init__(self, verbose: bool = True, use_snowflake: bool = True):
+    def __init__(self, verbose: bool = True, use_snowflake: bool = True, token_efficient_mode: bool = True):
         """
         Initialize the intelligent workflow system
         
         Args:
             verbose: Print detailed logs
             use_snowflake: Use Snowflake cloud storage (default: True for demos)
+            token_efficient_mode: Send downscaled screenshots to Gemini (default: True)
         """
         self.verbose = verbose
         
@@ -59,34 +252,58 @@ class IntelligentWorkflowSystem:
         self.memory = VisualWorkflowMemory()
         self.storage_type = "Local Files + Snowflake Demo"
         
-        # Connect to Snowflake for demo (but don't use it for storage)
-        if use_snowflake and SNOWFLAKE_AVAILABLE:
-            try:
-                self.snowflake_demo = SnowflakeWorkflowMemory()
-            except:
-                self.snowflake_demo = None
-        else:
-            self.snowflake_demo = None
-        
-        # Core components (all use the same memory backend)
-        self.matcher = SemanticWorkflowMatcher(memory=self.memory, use_snowflake=use_snowflake)
-        self.executor = GeminiWorkflowExecutor(memory=self.memory, verbose=verbose)
-        self.recorder = WorkflowRecorder(memory=self.memory)
+        # Build the remaining components in parallel - each one opens API
+        # clients or loads workflows from disk, and they only share `memory`
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            snowflake_future = pool.submit(self._connect_snowflake_demo, use_snowflake)
+            matcher_future = pool.submit(
+                SemanticWorkflowMatcher, memory=self.memory, use_snowflake=use_snowflake
+            )
+            executor_future = pool.submit(
+                GeminiWorkflowExecutor,
+                memory=self.memory,
+                verbose=verbose,
+                token_efficient_mode=token_efficient_mode
+            )
+            recorder_future = pool.submit(WorkflowRecorder, memory=self.memory)
+
+            # Core components (all use the same memory backend)
+            self.snowflake_demo = snowflake_future.result()
+            self.matcher = matcher_future.result()
+            self.executor = executor_future.result()
+            self.recorder = recorder_future.result()
         
         # Gemini client for parameter extraction
         self.api_key = os.getenv("GOOGLE_API_KEY")
         if self.api_key:
-            self.gemini_client = genai.Client(api_key=self.api_key)
+            self.gemini_client = get_gemini_client(self.api_key)
         else:
             print("⚠️  GOOGLE_API_KEY not set - parameter extraction disabled")
             self.gemini_client = None
         
-        print("=" * 70)
-        print("🧠 INTELLIGENT WORKFLOW SYSTEM")
-        print("=" * 70)
-        print(f"✅ All systems ready!")
-        print(f"   Storage: {self.storage_type}")
-        print()
+        # Same request + same workflow -> same parameters, skip the repeat LLM call
+        self._query_parameters_cached = lru_cache(maxsize=128)(self._query_parameters)
+        
+        # (workflow_id, name, description) -> parameter-extraction prompt template
+        self._parameter_prompts = {}
+        
+        # Normalized request -> action plan that ran to completion (direct execution)
+        self._direct_plans = {}
+        
+        # Background work overlapped with a request (e.g. prefetching the workflow)
+        self._request_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="request")
+        
+        _write_lines([_BANNER_SYSTEM_READY + f"   Storage: {self.storage_type}", ""])
+    
+    @staticmethod
+    def _connect_snowflake_demo(use_snowflake: bool):
+        """Connect to Snowflake for demo (but don't use it for storage)"""
+        if use_snowflake and SNOWFLAKE_AVAILABLE:
+            try:
+                return SnowflakeWorkflowMemory()
+            except:
+                return None
+        return None
     
     def execute_from_prompt(self, 
                            user_prompt: str,
@@ -105,9 +322,7 @@ class IntelligentWorkflowSystem:
         Returns:
             True if successful
         """
-        print("\n" + "=" * 70)
-        print(f"💬 USER REQUEST: {user_prompt}")
-        print("=" * 70)
+        _write_text(f"\n{_SEP}💬 USER REQUEST: {user_prompt}\n{_SEP}")
         
         # Step 1: Find similar workflows (for guidance, not required)
         print("\n🔍 Finding similar workflows...")
@@ -140,7 +355,7 @@ class IntelligentWorkflowSystem:
         
         # Step 2: Extract parameters
         print("\n🎯 Extracting parameters from your request...")
-        parameters = self._extract_parameters(user_prompt, best_workflow)
+        parameters = self._extract_parameters_and_prewarm(user_prompt, best_workflow)
         
         if parameters:
             print("\n✓ Extracted parameters:")
@@ -171,6 +386,63 @@ class IntelligentWorkflowSystem:
         
         return success
     
+    def _prelaunch_app(self, user_prompt: str) -> Optional[str]:
+        """
+        Speculatively launch (without focusing) an app the request asks to open.
+        
+        Only an explicit "open/launch <app>" counts, so the launch matches
+        what the plan will do anyway. macOS only (uses `open -a`).
+        
+        Returns:
+            Name of the launched app, or None
+        """
+        if sys.platform != 'darwin':
+            return None
+        
+        match = _SPECULATIVE_APP_RE.search(user_prompt)
+        if not match:
+            return None
+        
+        app_name = _SPECULATIVE_APPS[match.group(1).lower()]
+        try:
+            # -g keeps it in the background so it doesn't steal focus mid-plan
+            subprocess.Popen(['open', '-g', '-a', app_name],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except Exception:
+            return None
+        
+        if self.verbose:
+            print(f"   🚀 Pre-launching {app_name} while planning...")
+        return app_name
+    
+    def _plan_direct_actions(self, user_prompt: str):
+        """Ask Gemini to break a request down into a JSON list of actions"""
+        print("🤖 Analyzing request and planning actions...")
+        
+        # Start the app the request opens so it loads during the planning call
+        self._prelaunch_app(user_prompt)
+        
+        # Ask Gemini to break down the request into actionable steps
+        # Constant instructions first, the request last - keeps the prompt
+        # prefix identical across calls
+        planning_prompt = Content(role="user", parts=[
+            _DIRECT_PLAN_PROMPT_PART,
+            Part(text=f'\nThe user wants to: "{user_prompt}"\n'),
+        ])
+        
+        response = self.gemini_client.models.generate_content(
+            model="gemini-2.0-flash",
+            contents=planning_prompt,
+            config=get_generation_config(temperature=0.1, max_output_tokens=2048)
+        )
+        
+        content = response.text
+        
+        # Extract JSON
+        content = extract_json_text(content)
+        
+        return json.loads(content)
+    
     def _execute_direct(self, user_prompt: str, confirm_steps: bool = False) -> bool:
         """
         Execute a request directly using Gemini without workflow matching
@@ -189,72 +461,20 @@ class IntelligentWorkflowSystem:
             print("❌ Gemini client not available")
             return False
         
-        print("🤖 Analyzing request and planning actions...")
-        
-        # Ask Gemini to break down the request into actionable steps
-        planning_prompt = f"""You are a computer automation assistant. The user wants to: "{user_prompt}"
-
-Break this down into specific, actionable steps that can be executed on a computer.
-
-Return a JSON array of actions:
-[
-    {{
-        "action_type": "open_application" | "click" | "type" | "key" | "scroll" | "wait",
-        "target": "description of what to interact with (for click/open_application)",
-        "value": "text to type (for type) or key name (for key) or wait seconds (for wait)",
-        "description": "human-readable description of this step"
-    }},
-    ...
-]
-
-Rules:
-- Be specific (e.g., "Chrome browser" not just "browser")
-- For clicks, describe the element clearly (e.g., "GitHub search bar", "username field")
-- Include reasonable wait times between actions
-- Keep it simple - 3-10 steps max
-- Only include steps that are directly needed
-
-Example for "open github":
-[
-    {{"action_type": "open_application", "target": "Chrome", "description": "Open web browser"}},
-    {{"action_type": "wait", "value": "2", "description": "Wait for browser to load"}},
-    {{"action_type": "click", "target": "address bar", "description": "Click address bar"}},
-    {{"action_type": "type", "value": "github.com", "description": "Type GitHub URL"}},
-    {{"action_type": "key", "value": "enter", "description": "Press Enter to navigate"}}
-]
-
-CRITICAL RULES FOR macOS:
-- Apps are opened using Raycast launcher (Option + Space shortcut)
-- NEVER use target="Raycast" - Raycast is the LAUNCHER itself, not an app to open
-- For any app (Chrome, Safari, Twitter, etc.), use "open_application" with the app name
-- The system will automatically use Raycast to open it
-- Example: target="Chrome" will trigger: Option+Space → type "Chrome" → Enter
-
-Be very specific with click targets (e.g., "address bar at top of browser window")
-"""
+        # A plan that already ran for the same request is reused as-is
+        plan_key = _normalize_request(user_prompt)
         
         try:
-            response = self.gemini_client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=planning_prompt,
-                config=GenerateContentConfig(temperature=0.1, max_output_tokens=2048)
-            )
-            
-            content = response.text
-            
-            # Extract JSON
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            actions = json.loads(content)
-            
-            if not isinstance(actions, list) or not actions:
-                print("❌ Could not generate action plan")
-                return False
-            
-            print(f"\n✓ Generated {len(actions)} actions\n")
+            actions = self._direct_plans.get(plan_key)
+            if actions is not None:
+                print(f"⚡ Reusing plan from an earlier identical request ({len(actions)} actions)\n")
+            else:
+                actions = self._plan_direct_actions(user_prompt)
+                if not isinstance(actions, list) or not actions:
+                    print("❌ Could not generate action plan")
+                    return False
+                
+                print(f"\n✓ Generated {len(actions)} actions\n")
             
             # Show action plan
             if self.verbose:
@@ -284,6 +504,8 @@ Be very specific with click targets (e.g., "address bar at top of browser window
             except:
                 pass
             
+            # Only a plan with no failed step is kept for reuse
+            failed = False
             for i, action in enumerate(actions, 1):
                 action_type = action.get('action_type', '').lower()
                 target = action.get('target', '')
@@ -302,7 +524,8 @@ Be very specific with click targets (e.g., "address bar at top of browser window
                         pyautogui.write(target, interval=0.05)
                         time.sleep(0.5)  # Wait for results
                         pyautogui.press('return')
-                        time.sleep(2.5)  # Wait for app to fully open and become focused
+                        # Wait for app to open and become focused (returns early once it is)
+                        self.executor.wait_for_app_frontmost(target, timeout=2.5)
                         print("   ✓ Done")
                     
                     elif action_type == "click":
@@ -313,6 +536,7 @@ Be very specific with click targets (e.g., "address bar at top of browser window
                             print("   ✓ Click successful")
                         else:
                             print("   ⚠️  Click may have failed")
+                            failed = True
                         time.sleep(0.5)
                     
                     elif action_type == "type":
@@ -320,7 +544,7 @@ Be very specific with click targets (e.g., "address bar at top of browser window
                         print(f"   ⌨️  Typing: {value[:50]}...")
                         # Small delay to ensure focus is correct
                         time.sleep(0.2)
-                        pyautogui.write(value, interval=0.05)
+                        enter_text(value)
                         print("   ✓ Done")
                         time.sleep(0.3)
                     
@@ -347,9 +571,11 @@ Be very specific with click targets (e.g., "address bar at top of browser window
                     
                     else:
                         print(f"   ⚠️  Unknown action type: {action_type}")
+                        failed = True
                 
                 except Exception as e:
                     print(f"   ❌ Error: {e}")
+                    failed = True
                     if not confirm_steps:
                         # Continue anyway
                         continue
@@ -357,13 +583,12 @@ Be very specific with click targets (e.g., "address bar at top of browser window
                         response = input("   Continue? [y/n]: ").lower()
                         if response != 'y':
                             print("❌ Execution stopped")
+                            self._direct_plans.pop(plan_key, None)
                             return False
                 
                 print()
             
-            print("=" * 70)
-            print("✅ EXECUTION COMPLETED")
-            print("=" * 70)
+            _write_text(_BANNER_EXECUTION_COMPLETED)
             
             # Bring terminal back to focus
             try:
@@ -372,14 +597,28 @@ Be very specific with click targets (e.g., "address bar at top of browser window
             except:
                 pass
             
+            if failed:
+                # Re-plan next time instead of replaying a broken plan
+                self._direct_plans.pop(plan_key, None)
+            else:
+                self._direct_plans[plan_key] = actions
             return True
             
         except Exception as e:
             print(f"❌ Direct execution failed: {e}")
-            import traceback
-            traceback.print_exc()
+            debug_traceback(e)
             return False
     
+    def _extract_parameters_and_prewarm(self, user_prompt: str, workflow: Dict) -> Dict[str, str]:
+        """
+        Extract parameters while the executor loads the workflow from disk.
+        The Gemini round-trip dominates, so the load comes for free.
+        """
+        prewarm_future = self._request_pool.submit(self.executor.prewarm, workflow)
+        parameters = self._extract_parameters(user_prompt, workflow)
+        prewarm_future.result()
+        return parameters
+    
     def _extract_parameters(self, user_prompt: str, workflow: Dict) -> Dict[str, str]:
         """
         Extract parameter values from user prompt using Gemini
@@ -394,75 +633,99 @@ Be very specific with click targets (e.g., "address bar at top of browser window
         if not self.gemini_client:
             return {}
         
-        # Get workflow context
-        workflow_name = workflow['name']
-        workflow_desc = workflow.get('description', '')
-        
-        # Load workflow to see what parameters it needs
-        try:
-            full_workflow = self.memory.get_workflow(workflow['workflow_id'])
-            steps = full_workflow.get('steps', [])
-            
-            # Analyze steps to find parameterizable elements
-            # Look for things like text that was typed, clicked elements, etc.
-            
-        except:
-            steps = []
-        
-        # Use Gemini to extract parameters
-        prompt = f"""Analyze this user request and extract relevant parameters.
-
-User Request: "{user_prompt}"
-Workflow: "{workflow_name}"
-Description: "{workflow_desc}"
-
-Based on the request, extract any specific values the user wants to use.
-
-IMPORTANT: For email-related workflows, use these EXACT parameter names:
-- "recipient_email": The email address to send to
-- "email_subject": The subject line of the email
-- "email_body": The body/content of the email
-
-For other workflows, extract values like:
-- Ticket numbers (e.g., "ABC-123")
-- Company names (e.g., "Google")
-- Course names (e.g., "Machine Learning")
-- File names
-- Search terms
-- Etc.
-
-Return a JSON object with parameter names and values:
-{{
-    "param_name": "value",
-    ...
-}}
-
-If no parameters needed, return {{}}
-"""
+        # Nothing to fill in - no need to ask Gemini
+        if not self._workflow_needs_parameters(workflow):
+            return {}
         
         try:
-            response = self.gemini_client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt,
-                config=GenerateContentConfig(temperature=0.1)
+            parameters = self._query_parameters_cached(
+                user_prompt,
+                self._get_parameter_prompt(workflow)
             )
-            
-            content = response.text
-            
-            # Extract JSON
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            parameters = json.loads(content)
-            return parameters if isinstance(parameters, dict) else {}
+            return dict(parameters)
             
         except Exception as e:
             if self.verbose:
                 print(f"⚠️  Parameter extraction failed: {e}")
             return {}
     
+    @staticmethod
+    def _workflow_needs_parameters(workflow: Dict) -> bool:
+        """
+        Check whether a workflow can take parameters from the user's request.
+        
+        Templates only need them when one of their actions is parameterizable.
+        Learned workflows always get them, since they are used as context for
+        Gemini's generalization.
+        """
+        if workflow.get('parameters'):
+            return True
+        if not workflow.get('is_template', False):
+            return True
+        return any(
+            action.get('is_parameterizable', False)
+            for action in workflow.get('semantic_actions', [])
+        )
+    
+    def _get_parameter_prompt(self, workflow: Dict) -> str:
+        """
+        Parameter-extraction prompt for a workflow, with only {USER_REQUEST} left to fill.
+        Built once per workflow and reused on every request.
+        """
+        workflow_name = workflow['name']
+        workflow_desc = workflow.get('description', '')
+        cache_key = (workflow['workflow_id'], workflow_name, workflow_desc)
+        
+        prompt_template = self._parameter_prompts.get(cache_key)
+        if prompt_template is None:
+            # Parameter names the workflow will substitute, if known
+            names = [p['name'] for p in workflow.get('parameters', []) if isinstance(p, dict) and p.get('name')]
+            for action in workflow.get('semantic_actions', []):
+                for field in ('target', 'value', 'text'):
+                    if isinstance(action.get(field), str):
+                        names.extend(_PLACEHOLDER_RE.findall(action[field]))
+            names = list(dict.fromkeys(names))
+            
+            expected = ""
+            if names:
+                expected = f"\nThis workflow expects these parameter names: {json.dumps(names)}\n"
+            
+            prompt_template = (
+                _PARAMETER_PROMPT
+                .replace('{WORKFLOW_NAME}', workflow_name)
+                .replace('{WORKFLOW_DESCRIPTION}', workflow_desc)
+                .replace('{EXPECTED_PARAMETERS}', expected)
+            )
+            self._parameter_prompts[cache_key] = prompt_template
+        
+        return prompt_template
+    
+    def _query_parameters(self,
+                          user_prompt: str,
+                          prompt_template: str) -> Tuple[Tuple[str, str], ...]:
+        """
+        Ask Gemini for the parameter values in a request (cached per request/workflow).
+        
+        Raises on failure so that errors are never cached.
+        
+        Returns:
+            Parameter (name, value) pairs
+        """
+        # Only the user's request varies per call
+        prompt = prompt_template.replace('{USER_REQUEST}', user_prompt)
+        
+        response = self.gemini_client.models.generate_content(
+            model="gemini-2.0-flash",
+            contents=prompt,
+            config=get_generation_config(temperature=0.1, response_mime_type="application/json")
+        )
+        
+        # JSON mime type - the response is bare JSON, no code fences
+        parameters = _loads_json(response.text)
+        if not isinstance(parameters, dict):
+            return ()
+        return tuple(parameters.items())
+    
     def record_workflow(self, workflow_name: str, description: str = "", tags: List[str] = None):
         """
         Start recording a new workflow
@@ -475,9 +738,7 @@ If no parameters needed, return {{}}
         Returns:
             workflow_id
         """
-        print("\n" + "=" * 70)
-        print("🔴 RECORDING STARTED")
-        print("=" * 70)
+        _write_text(_BANNER_RECORDING_STARTED)
         
         workflow_id = self.recorder.start_recording(
             workflow_name=workflow_name,
@@ -485,103 +746,148 @@ If no parameters needed, return {{}}
             tags=tags
         )
         
-        print(f"\n✅ Now recording: {workflow_name}")
-        print()
-        print("📝 What to do:")
-        print("   1. Perform your workflow now (I'm watching!)")
-        print("   2. Click, type, navigate - do whatever you need")
-        print()
-        print("⏹  When done, type: stop")
-        print()
-        print("=" * 70)
+        _write_text(f"\n✅ Now recording: {workflow_name}\n" + _RECORDING_INSTRUCTIONS)
         
         return workflow_id
     
     def stop_recording(self):
         """Stop recording and finalize workflow"""
-        return self.recorder.stop_recording()
+        workflow_id = self.recorder.stop_recording()
+        if workflow_id:
+            # Re-encode the new recording on the next match
+            self.matcher.forget_workflow(workflow_id)
+        return workflow_id
     
     def list_workflows(self):
         """List all learned workflows"""
-        workflows = self.memory.list_workflows(status='ready')
+        print_workflow_list(self.memory)
+    
+    def _read_command(self, prompt: str) -> str:
+        """
+        Like input(), but keeps doing idle maintenance while the user types.
         
-        if not workflows:
-            print("\n📚 No learned workflows yet")
-            print("\n💡 Record your first workflow:")
-            print("   system.record_workflow('Close Jira Ticket')")
-            return
+        The blocking input() stays on this thread (it shares sys.stdin's
+        buffer with the other prompts); the idle checks run on a ticker
+        thread until it returns.
+        """
+        typing_done = threading.Event()
         
-        print("\n" + "=" * 70)
-        print(f"📚 LEARNED WORKFLOWS ({len(workflows)} total)")
-        print("=" * 70)
+        def tick():
+            while not typing_done.is_set():
+                self._run_idle_tasks()
+                typing_done.wait(IDLE_POLL_SECONDS)
+        
+        ticker = threading.Thread(target=tick, daemon=True)
+        ticker.start()
+        try:
+            return input(prompt)
+        finally:
+            typing_done.set()
+    
+    def _run_idle_tasks(self):
+        """
+        Bring workflow context and embeddings up to date after memory changes.
         
-        for i, wf in enumerate(workflows, 1):
-            print(f"\n{i}. {wf['name']}")
-            if wf.get('description'):
-                print(f"   {wf['description']}")
-            if wf.get('tags'):
-                print(f"   Tags: {', '.join(wf['tags'])}")
-            print(f"   Used: {wf.get('use_count', 0)} times")
+        The work runs on a background thread so a command typed meanwhile
+        is read (and started) right away.
+        """
+        if self._idle_thread is not None and self._idle_thread.is_alive():
+            return
+        if self.memory.version == self._idle_memory_version:
+            return
+        self._idle_memory_version = self.memory.version
         
-        print("\n" + "=" * 70)
+        self._idle_thread = threading.Thread(target=self._refresh_caches, daemon=True)
+        self._idle_thread.start()
+    
+    def _refresh_caches(self):
+        """So the next request doesn't pay for the reload / re-encoding"""
+        self.executor._sync_workflows(quiet=True)
+        self.matcher.warm_embeddings()
+    
+    def _workflow_snapshot(self):
+        """memory.snapshot() where the storage backend supports it"""
+        snapshot = getattr(self.memory, 'snapshot', None)
+        return snapshot() if snapshot is not None else nullcontext()
+    
+    def _demo_stop(self):
+        """Demo 'stop' command"""
+        if not self.recorder.is_recording:
+            print("\n⚠️  Not recording anything")
+        else:
+            self.stop_recording()
+    
+    def _demo_quit(self) -> bool:
+        """Demo 'quit' command; returns True to leave demo mode"""
+        if self.recorder.is_recording:
+            print("\n⚠️  Still recording! Type 'stop' first, then 'quit'")
+            return False
+        print("👋 Goodbye!")
+        return True
+    
+    @staticmethod
+    def _demo_help():
+        """Demo 'help' command"""
+        _write_text(_DEMO_COMMANDS_HELP)
     
     def demo_mode(self):
         """Interactive demo mode"""
-        print("\n" + "=" * 70)
-        print("🎮 DEMO MODE")
-        print("=" * 70)
-        print()
-        print("Commands:")
-        print("  - Type a natural language request")
-        print("  - 'list' - Show all workflows")
-        print("  - 'record <name>' - Start recording")
-        print("  - 'stop' - Stop recording")
-        print("  - 'quit' - Exit demo mode")
-        print()
+        _write_text(_BANNER_DEMO_MODE)
+        
+        # Encode workflows while the user is typing their first request
+        self._idle_thread = threading.Thread(target=self.matcher.warm_embeddings, daemon=True)
+        self._idle_thread.start()
+        self._idle_memory_version = self.memory.version
+        
+        # Exact-match commands (a handler returning True ends demo mode);
+        # 'record <name>' takes an argument and anything else is a request
+        commands = {
+            'list': self.list_workflows,
+            'stop': self._demo_stop,
+            'quit': self._demo_quit,
+            'exit': self._demo_quit,
+            'q': self._demo_quit,
+            'help': self._demo_help,
+            'h': self._demo_help,
+            '?': self._demo_help,
+        }
         
         while True:
             try:
                 # Show if currently recording
                 if self.recorder.is_recording:
-                    user_input = input("\n🔴 RECORDING > Type 'stop' to finish: ").strip()
+                    user_input = self._read_command("\n🔴 RECORDING > Type 'stop' to finish: ").strip()
                 else:
-                    user_input = input("\n💬 Your request: ").strip()
+                    user_input = self._read_command("\n💬 Your request: ").strip()
                 
                 if not user_input:
                     continue
                 
-                if user_input.lower() == 'quit':
-                    if self.recorder.is_recording:
-                        print("\n⚠️  Still recording! Type 'stop' first, then 'quit'")
-                        continue
-                    print("👋 Goodbye!")
-                    break
-                
-                elif user_input.lower() == 'list':
-                    self.list_workflows()
-                
-                elif user_input.lower().startswith('record '):
-                    if self.recorder.is_recording:
-                        print("\n⚠️  Already recording! Type 'stop' first")
-                        continue
-                    workflow_name = user_input[7:].strip()
-                    if workflow_name:
-                        self.record_workflow(workflow_name)
-                    else:
-                        print("Usage: record <workflow name>")
-                
-                elif user_input.lower() == 'stop':
-                    if not self.recorder.is_recording:
-                        print("\n⚠️  Not recording anything")
+                # One workflow scan shared by everything this command does
+                with self._workflow_snapshot():
+                    command = user_input.lower()
+                    handler = commands.get(command)
+                    
+                    if handler is not None:
+                        if handler():
+                            break
+                    
+                    elif command.startswith('record '):
+                        if self.recorder.is_recording:
+                            print("\n⚠️  Already recording! Type 'stop' first")
+                            continue
+                        workflow_name = user_input[7:].strip()
+                        if workflow_name:
+                            self.record_workflow(workflow_name)
+                        else:
+                            print("Usage: record <workflow name>")
+                    
                     else:
-                        self.stop_recording()
-                
-                else:
-                    if self.recorder.is_recording:
-                        print("\n⚠️  Currently recording - type 'stop' to finish recording first")
-                        continue
-                    # Execute from prompt
-                    self.execute_from_prompt(user_input, auto_execute=False, confirm_steps=False)
+                        if self.recorder.is_recording:
+                            print("\n⚠️  Currently recording - type 'stop' to finish recording first")
+                            continue
+                        # Execute from prompt
+                        self.execute_from_prompt(user_input, auto_execute=False, confirm_steps=False)
                 
             except KeyboardInterrupt:
                 print("\n\n👋 Interrupted. Type 'quit' to exit.")
@@ -591,18 +897,7 @@ If no parameters needed, return {{}}
 
 def main():
     """Main entry point"""
-    print()
-    print("=" * 70)
-    print("🚀 INTELLIGENT WORKFLOW AUTOMATION SYSTEM")
-    print("=" * 70)
-    print()
-    print("Learn workflows by demonstration, then execute them with prompts!")
-    print()
-    print("Examples:")
-    print("  • 'Close Jira ticket ABC-123'")
-    print("  • 'Download files from Canvas for Machine Learning class'")
-    print("  • 'Fill out job application for Google'")
-    print()
+    _write_text(_BANNER_WELCOME)
     
     # Initialize system
     system = IntelligentWorkflowSystem(verbose=True)
@@ -610,12 +905,7 @@ def main():
     # Show available workflows
     system.list_workflows()
     
-    print("\n" + "=" * 70)
-    print("Ready! Try:")
-    print("  system.execute_from_prompt('your request here')")
-    print("  system.record_workflow('Workflow Name')")
-    print("  system.demo_mode()  # Interactive mode")
-    print("=" * 70)
+    _write_text(_BANNER_READY)
     
     return system
 
@@ -4,7 +4,9 @@ Monitors user actions and captures visual context for workflow learning
 """
 
 import time
+import queue
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable, Optional
 from pathlib import Path
 from datetime import datetime
@@ -41,10 +43,20 @@ class WorkflowRecorder:
         # State tracking
         self.last_screenshot = None
         self.last_action_time = 0
+        # Logical screen size, read once per recording for click normalization
+        self.screen_size = None
         self.action_buffer = []
+        # Steps waiting for their "after" screenshot, handled in order by a
+        # worker thread so the input listeners never sleep or do file I/O
+        self._step_queue = queue.Queue()
+        self._step_thread = None
+        # Saves steps (PNG encoding) in order, so a slow save doesn't delay
+        # the next action's "after" screenshot
+        self._save_executor = None
         
         # Configuration
         self.min_action_interval = 0.5  # Minimum seconds between actions
+        self.ui_settle_delay = 0.1  # Seconds after an action before the "after" screenshot
         self.screenshot_on_action = True
         self.track_mouse_moves = False  # Usually too noisy
         
@@ -76,6 +88,7 @@ class WorkflowRecorder:
         
         # Take initial screenshot
         self.last_screenshot = self._capture_screenshot()
+        self.screen_size = pyautogui.size()
         
         # Start listeners
         self._start_listeners()
@@ -141,6 +154,10 @@ class WorkflowRecorder:
     
     def _start_listeners(self):
         """Start mouse and keyboard listeners."""
+        self._save_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recorder-save")
+        self._step_thread = threading.Thread(target=self._step_worker, name="recorder-steps", daemon=True)
+        self._step_thread.start()
+        
         self.mouse_listener = mouse.Listener(
             on_click=self._on_mouse_click,
             on_scroll=self._on_mouse_scroll
@@ -164,7 +181,11 @@ class WorkflowRecorder:
     
     def _capture_screenshot(self) -> Image.Image:
         """Capture current screen state."""
-        return pyautogui.screenshot()
+        # In-process mss grab when available (falls back to pyautogui). The
+        # first call is the initial screenshot in start_recording, so the
+        # import is paid there rather than on a listener thread.
+        from gemini_computer_use import capture_screen
+        return Image.fromarray(capture_screen())
     
     def _on_mouse_click(self, x, y, button, pressed):
         """Handle mouse click events."""
@@ -182,21 +203,16 @@ class WorkflowRecorder:
         
         self.last_action_time = current_time
         
-        # Capture action
-        screenshot_before = self.last_screenshot
-        time.sleep(0.1)  # Small delay for UI to update
-        screenshot_after = self._capture_screenshot()
-        
-        # Get screen size for normalization
-        screen_width, screen_height = pyautogui.size()
+        # Screen size for normalization (fixed for the recording)
+        screen_width, screen_height = self.screen_size
         
         # Record the action
         action_data = {
             'x': x,
             'y': y,
             'button': str(button),
-            'normalized_x': int((x / screen_width) * 1000),
-            'normalized_y': int((y / screen_height) * 1000),
+            'normalized_x': int(x * 1000 // screen_width),
+            'normalized_y': int(y * 1000 // screen_height),
             'timestamp': current_time
         }
         
@@ -206,18 +222,8 @@ class WorkflowRecorder:
             'screen_size': (screen_width, screen_height)
         }
         
-        # Add step to workflow
-        self.memory.add_step(
-            workflow_id=self.workflow_id,
-            action_type='click',
-            action_data=action_data,
-            screenshot_before=screenshot_before,
-            screenshot_after=screenshot_after,
-            visual_context=visual_context
-        )
-        
-        # Update last screenshot
-        self.last_screenshot = screenshot_after
+        # Add step to workflow (the "after" screenshot is taken by the step worker)
+        self._queue_step('click', action_data, visual_context, current_time)
     
     def _on_mouse_scroll(self, x, y, dx, dy):
         """Handle mouse scroll events."""
@@ -231,11 +237,6 @@ class WorkflowRecorder:
         
         self.last_action_time = current_time
         
-        # Capture state
-        screenshot_before = self.last_screenshot
-        time.sleep(0.1)
-        screenshot_after = self._capture_screenshot()
-        
         # Determine scroll direction
         if dy > 0:
             direction = 'up'
@@ -259,16 +260,7 @@ class WorkflowRecorder:
             'description': f"Scroll {direction} at ({x}, {y})"
         }
         
-        self.memory.add_step(
-            workflow_id=self.workflow_id,
-            action_type='scroll',
-            action_data=action_data,
-            screenshot_before=screenshot_before,
-            screenshot_after=screenshot_after,
-            visual_context=visual_context
-        )
-        
-        self.last_screenshot = screenshot_after
+        self._queue_step('scroll', action_data, visual_context, current_time)
     
     def _on_key_press(self, key):
         """Handle keyboard events."""
@@ -294,10 +286,6 @@ class WorkflowRecorder:
             
             self.last_action_time = current_time
             
-            screenshot_before = self.last_screenshot
-            time.sleep(0.1)
-            screenshot_after = self._capture_screenshot()
-            
             key_name = str(key).replace('Key.', '')
             
             action_data = {
@@ -309,21 +297,64 @@ class WorkflowRecorder:
                 'description': f"Press {key_name}"
             }
             
-            self.memory.add_step(
-                workflow_id=self.workflow_id,
-                action_type='key_press',
+            self._queue_step('key_press', action_data, visual_context, current_time)
+    
+    def _queue_step(self, action_type: str, action_data: dict, visual_context: dict,
+                    action_time: float, capture: bool = True):
+        """Hand a recorded action to the step worker (returns immediately)."""
+        self._step_queue.put((self.workflow_id, action_type, action_data, visual_context, action_time, capture))
+    
+    def _step_worker(self):
+        """Capture each action's "after" screenshot and queue the step for saving, in order."""
+        while True:
+            item = self._step_queue.get()
+            if item is None:
+                break
+            workflow_id, action_type, action_data, visual_context, action_time, capture = item
+            
+            screenshots = {}
+            if capture:
+                # Give the UI time to update - unless the queue is already behind
+                remaining = action_time + self.ui_settle_delay - time.time()
+                if remaining > 0:
+                    time.sleep(remaining)
+                
+                try:
+                    screenshot_after = self._capture_screenshot()
+                except Exception as e:
+                    print(f"⚠️  Failed to record {action_type} step: {e}")
+                    continue
+                screenshots = {
+                    'screenshot_before': self.last_screenshot,
+                    'screenshot_after': screenshot_after
+                }
+                self.last_screenshot = screenshot_after
+            
+            future = self._save_executor.submit(
+                self.memory.add_step,
+                workflow_id=workflow_id,
+                action_type=action_type,
                 action_data=action_data,
-                screenshot_before=screenshot_before,
-                screenshot_after=screenshot_after,
-                visual_context=visual_context
+                visual_context=visual_context,
+                **screenshots
             )
-            
-            self.last_screenshot = screenshot_after
+            future.add_done_callback(self._report_save_error)
+    
+    @staticmethod
+    def _report_save_error(future):
+        if future.exception() is not None:
+            print(f"⚠️  Failed to save step: {future.exception()}")
     
     def _flush_buffer(self):
         """Process any buffered actions."""
-        # For future use if we buffer actions for batch processing
-        pass
+        # Wait for the step worker to capture, then save, every queued step
+        if self._step_thread:
+            self._step_queue.put(None)
+            self._step_thread.join()
+            self._step_thread = None
+        if self._save_executor:
+            self._save_executor.shutdown(wait=True)
+            self._save_executor = None
     
     def add_annotation(self, text: str):
         """
@@ -334,31 +365,28 @@ class WorkflowRecorder:
             print("⚠️  Not currently recording.")
             return
         
+        current_time = time.time()
         action_data = {
             'annotation': text,
-            'timestamp': time.time()
+            'timestamp': current_time
         }
         
-        self.memory.add_step(
-            workflow_id=self.workflow_id,
-            action_type='annotation',
-            action_data=action_data,
-            visual_context={'description': f"Annotation: {text}"}
-        )
+        # Queued behind any pending steps so step order is preserved
+        self._queue_step('annotation', action_data, {'description': f"Annotation: {text}"},
+                         current_time, capture=False)
         
         print(f"📝 Annotation added: {text}")
     
     def _analyze_with_vlm(self) -> str:
         """Use Gemini VLM to understand workflow intention from screenshots"""
         import os
-        from google import genai
-        from google.genai.types import GenerateContentConfig
+        from gemini_client import get_gemini_client, get_generation_config
         
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
             return "Workflow recording"
         
-        client = genai.Client(api_key=api_key)
+        client = get_gemini_client(api_key)
         workflow_dir = self.memory.storage_dir / self.workflow_id / "steps"
         
         # Get first and last screenshots
@@ -374,14 +402,18 @@ class WorkflowRecorder:
         img1 = Image.open(first_screenshot)
         img2 = Image.open(last_screenshot)
         
-        # Convert to base64
+        # Convert to base64 (downscaled JPEG - plenty for a one-line summary)
         import base64
         from io import BytesIO
+        from gemini_computer_use import downscale_for_vision, SCREENSHOT_JPEG_QUALITY
         
         def img_to_base64(img):
             buffered = BytesIO()
-            img.save(buffered, format="PNG")
-            return base64.b64encode(buffered.getvalue()).decode()
+            # Downscale before converting so only the small image is copied
+            downscale_for_vision(img).convert('RGB').save(
+                buffered, format="JPEG", quality=SCREENSHOT_JPEG_QUALITY
+            )
+            return base64.b64encode(buffered.getbuffer()).decode()
         
         img1_b64 = img_to_base64(img1)
         img2_b64 = img_to_base64(img2)
@@ -410,11 +442,11 @@ Be specific but brief."""
                 contents=[
                     {"role": "user", "parts": [
                         {"text": prompt},
-                        {"inline_data": {"mime_type": "image/png", "data": img1_b64}},
-                        {"inline_data": {"mime_type": "image/png", "data": img2_b64}}
+                        {"inline_data": {"mime_type": "image/jpeg", "data": img1_b64}},
+                        {"inline_data": {"mime_type": "image/jpeg", "data": img2_b64}}
                     ]}
                 ],
-                config=GenerateContentConfig(temperature=0.3, max_output_tokens=30)
+                config=get_generation_config(temperature=0.3, max_output_tokens=30)
             )
             
             intention = response.text.strip().replace('"', '').replace("'", "")
@@ -16,16 +16,93 @@ Example transformation:
 import os
 import json
 import time
+import hashlib
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from PIL import Image
 import base64
 import io
+from concurrent.futures import ThreadPoolExecutor
 
-from google import genai
 from google.genai.types import GenerateContentConfig
 
+from gemini_client import get_gemini_client, get_generation_config, extract_json_text
 from visual_memory import VisualWorkflowMemory
+from gemini_computer_use import (
+    downscale_for_vision,
+    SCREENSHOT_MAX_DIM,
+    SCREENSHOT_JPEG_QUALITY,
+    SCREENSHOT_PNG_COMPRESS_LEVEL,
+    SCREENSHOT_PNG_MAX_DIM,
+)
+
+
+# On-disk cache of Gemini responses, so re-analyzing a recording (same
+# prompts, same screenshots) doesn't repeat every API round-trip
+LLM_CACHE_DIR = Path.home() / ".agentflow" / "llm_cache"
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+# Entries kept on disk; expired and excess (oldest) entries are pruned on
+# the first cache write of an analyzer and then every LLM_CACHE_PRUNE_EVERY
+LLM_CACHE_MAX_ENTRIES = 2000
+LLM_CACHE_PRUNE_EVERY = 100
+
+
+def _prune_llm_cache():
+    """Delete expired cache entries, then the oldest beyond LLM_CACHE_MAX_ENTRIES"""
+    cutoff = time.time() - LLM_CACHE_TTL_SECONDS
+    entries = []
+    for path in LLM_CACHE_DIR.glob("*.json"):
+        try:
+            mtime = path.stat().st_mtime
+            if mtime < cutoff:
+                path.unlink()
+            else:
+                entries.append((mtime, path))
+        except OSError:
+            pass
+    
+    excess = len(entries) - LLM_CACHE_MAX_ENTRIES
+    if excess > 0:
+        entries.sort()
+        for _, path in entries[:excess]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+# Region of the screenshot (width, height in screenshot pixels) sent to Gemini
+# when naming a clicked element - enough surrounding UI for context, while the
+# element keeps more of its resolution than in a downscaled full screen
+CLICK_ROI_SIZE = (1280, 800)
+
+
+def click_roi(image_size, x: int, y: int, roi_size=CLICK_ROI_SIZE):
+    """(left, top, right, bottom) box of roi_size centered on (x, y), kept inside the image"""
+    width, height = image_size
+    roi_w, roi_h = min(roi_size[0], width), min(roi_size[1], height)
+    left = min(max(0, x - roi_w // 2), width - roi_w)
+    top = min(max(0, y - roi_h // 2), height - roi_h)
+    return left, top, left + roi_w, top + roi_h
+
+
+def click_image_point(step: Dict, image_size) -> Tuple[int, int]:
+    """
+    Recorded click position in screenshot pixels.
+
+    Clicks are recorded in logical screen points, but screenshots are in
+    physical pixels (2x on Retina), so the point is scaled by the image /
+    screen size ratio - or from the 0-999 normalized position if the
+    recording has no screen size.
+    """
+    action_data = step['action_data']
+    width, height = image_size
+    screen_size = step.get('visual_context', {}).get('screen_size')
+    if screen_size:
+        screen_w, screen_h = screen_size
+        return int(action_data['x'] * width / screen_w), int(action_data['y'] * height / screen_h)
+    if 'normalized_x' in action_data and 'normalized_y' in action_data:
+        return action_data['normalized_x'] * width // 1000, action_data['normalized_y'] * height // 1000
+    return int(action_data['x']), int(action_data['y'])
 
 
 class SemanticActionAnalyzer:
@@ -38,21 +115,28 @@ class SemanticActionAnalyzer:
     - Parameter detection: "course_name" can be substituted later
     """
     
-    def __init__(self, verbose: bool = True):
+    def __init__(self, verbose: bool = True, token_efficient_mode: bool = True, use_llm_cache: bool = True, client=None):
         """
         Initialize semantic analyzer
         
         Args:
             verbose: Print detailed analysis logs
+            token_efficient_mode: Send downscaled JPEG screenshots instead of full-size PNGs
+            use_llm_cache: Reuse cached Gemini responses for identical requests
+            client: genai.Client to use (or the shared one)
         """
         self.verbose = verbose
+        self.use_llm_cache = use_llm_cache
+        self._llm_cache_writes = 0
+        self.token_efficient_mode = token_efficient_mode
+        self.image_mime_type = "image/jpeg" if token_efficient_mode else "image/png"
         
         # Initialize Gemini
         self.api_key = os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             raise ValueError("GOOGLE_API_KEY environment variable required")
         
-        self.client = genai.Client(api_key=self.api_key)
+        self.client = client or get_gemini_client(self.api_key)
         self.model = "gemini-2.0-flash"
         
         if self.verbose:
@@ -101,21 +185,31 @@ class SemanticActionAnalyzer:
         if workflow_dir:
             workflow_dir = workflow_dir / workflow_id
         
-        for i, group in enumerate(action_groups, 1):
-            if self.verbose:
-                print(f"\n🔍 Analyzing action group {i}/{len(action_groups)}...")
-            
-            semantic_action = self._analyze_action_group(
-                group=group,
-                workflow_dir=workflow_dir,
-                group_number=i
-            )
+        # Decode the next group's screenshots from disk while the current
+        # group waits on Gemini
+        with ThreadPoolExecutor(max_workers=1) as loader:
+            next_screenshots = loader.submit(self._load_group_screenshots, action_groups[0], workflow_dir)
             
-            if semantic_action:
-                semantic_actions.append(semantic_action)
-                
+            for i, group in enumerate(action_groups, 1):
                 if self.verbose:
-                    print(f"   ✓ {semantic_action['semantic_type']}: {semantic_action.get('description', 'N/A')}")
+                    print(f"\n🔍 Analyzing action group {i}/{len(action_groups)}...")
+                
+                screenshots = next_screenshots.result()
+                if i < len(action_groups):
+                    next_screenshots = loader.submit(self._load_group_screenshots, action_groups[i], workflow_dir)
+                
+                semantic_action = self._analyze_action_group(
+                    group=group,
+                    workflow_dir=workflow_dir,
+                    group_number=i,
+                    screenshots=screenshots
+                )
+                
+                if semantic_action:
+                    semantic_actions.append(semantic_action)
+                    
+                    if self.verbose:
+                        print(f"   ✓ {semantic_action['semantic_type']}: {semantic_action.get('description', 'N/A')}")
         
         # Identify parameters across all actions
         if self.verbose:
@@ -188,10 +282,47 @@ class SemanticActionAnalyzer:
         
         return groups
     
+    def _load_group_screenshots(self,
+                                group: List[Dict],
+                                workflow_dir: Path) -> Tuple[Optional[Image.Image], Optional[Image.Image]]:
+        """
+        Load and decode the before/after screenshots of an action group
+        (only for local storage, and only for actions that use them)
+        
+        Returns:
+            (screenshot_before, screenshot_after)
+        """
+        screenshot_before = None
+        screenshot_after = None
+        
+        if not workflow_dir or not group or group[0]['action_type'] not in ('key_press', 'click'):
+            return screenshot_before, screenshot_after
+        
+        try:
+            first_step = group[0]
+            if first_step.get('screenshot_before'):
+                img_path = workflow_dir / "steps" / first_step['screenshot_before']
+                if img_path.exists():
+                    screenshot_before = Image.open(img_path)
+                    screenshot_before.load()
+            
+            last_step = group[-1]
+            if last_step.get('screenshot_after'):
+                img_path = workflow_dir / "steps" / last_step['screenshot_after']
+                if img_path.exists():
+                    screenshot_after = Image.open(img_path)
+                    screenshot_after.load()
+        except Exception as e:
+            if self.verbose:
+                print(f"   ⚠️  Could not load screenshots: {e}")
+        
+        return screenshot_before, screenshot_after
+    
     def _analyze_action_group(self,
                              group: List[Dict],
                              workflow_dir: Path,
-                             group_number: int) -> Optional[Dict]:
+                             group_number: int,
+                             screenshots: Tuple[Optional[Image.Image], Optional[Image.Image]] = None) -> Optional[Dict]:
         """
         Analyze a group of actions and determine semantic meaning
         
@@ -199,6 +330,7 @@ class SemanticActionAnalyzer:
             group: List of raw action steps
             workflow_dir: Directory containing workflow data
             group_number: Sequential number of this group
+            screenshots: (before, after) already loaded by _load_group_screenshots
         
         Returns:
             Semantic action dict
@@ -209,25 +341,10 @@ class SemanticActionAnalyzer:
         first_step = group[0]
         action_type = first_step['action_type']
         
-        # Load screenshots for visual context (only for local storage)
-        screenshot_before = None
-        screenshot_after = None
-        
-        if workflow_dir:
-            try:
-                if first_step.get('screenshot_before'):
-                    img_path = workflow_dir / "steps" / first_step['screenshot_before']
-                    if img_path.exists():
-                        screenshot_before = Image.open(img_path)
-                
-                last_step = group[-1]
-                if last_step.get('screenshot_after'):
-                    img_path = workflow_dir / "steps" / last_step['screenshot_after']
-                    if img_path.exists():
-                        screenshot_after = Image.open(img_path)
-            except Exception as e:
-                if self.verbose:
-                    print(f"   ⚠️  Could not load screenshots: {e}")
+        # Screenshots for visual context
+        if screenshots is None:
+            screenshots = self._load_group_screenshots(group, workflow_dir)
+        screenshot_before, screenshot_after = screenshots
         
         # Analyze based on action type
         if action_type == 'key_press':
@@ -327,12 +444,13 @@ class SemanticActionAnalyzer:
         x = action_data.get('x')
         y = action_data.get('y')
         
-        if screenshot_before:
+        if screenshot_before and x is not None and y is not None:
             # Use Gemini to identify what's at the click location
+            image_x, image_y = click_image_point(step, screenshot_before.size)
             element_info = self._identify_clicked_element_with_gemini(
                 screenshot=screenshot_before,
-                x=x,
-                y=y
+                x=image_x,
+                y=image_y
             )
             
             if element_info:
@@ -374,12 +492,8 @@ class SemanticActionAnalyzer:
         text = []
         
         for key in keys:
-            # Skip special keys
-            if key.lower() in ['enter', 'tab', 'esc', 'escape', 'backspace', 
-                               'delete', 'alt', 'cmd', 'ctrl', 'shift', 'space']:
-                continue
-            
-            # Add regular characters
+            # Named keys (enter, tab, shift, ...) are all longer than one
+            # character, so keeping single characters skips them too
             if len(key) == 1:
                 text.append(key)
         
@@ -415,29 +529,23 @@ Respond in JSON:
     "field_type": "search/input/textarea/etc"
 }}"""
 
-            response = self.client.models.generate_content(
-                model=self.model,
+            content = self._generate_cached(
                 contents=[
                     {
                         "role": "user",
                         "parts": [
                             {"text": prompt},
-                            {"inline_data": {"mime_type": "image/png", "data": img_before_b64}},
+                            {"inline_data": {"mime_type": self.image_mime_type, "data": img_before_b64}},
                             {"text": "After typing:"},
-                            {"inline_data": {"mime_type": "image/png", "data": img_after_b64}}
+                            {"inline_data": {"mime_type": self.image_mime_type, "data": img_after_b64}}
                         ]
                     }
                 ],
-                config=GenerateContentConfig(temperature=0.1, max_output_tokens=512)
+                config=get_generation_config(temperature=0.1, max_output_tokens=512)
             )
             
-            content = response.text
-            
             # Extract JSON
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+            content = extract_json_text(content)
             
             return json.loads(content)
             
@@ -452,26 +560,42 @@ Respond in JSON:
                                              y: int) -> Optional[Dict]:
         """
         Use Gemini to identify what element was clicked at coordinates (x, y)
+        (in screenshot pixels, see click_image_point)
         
         Returns:
             Dict with element_name, element_type, description, parameterizable
         """
         try:
-            img_b64 = self._encode_image(screenshot)
+            # Only the area around the click is needed to name the element
+            roi = click_roi(screenshot.size, x, y)
+            x, y = x - roi[0], y - roi[1]
+            region = screenshot.crop(roi) if roi != (0, 0) + screenshot.size else screenshot
             
             # Draw a marker at click location for Gemini to see
-            marked_screenshot = screenshot.copy()
+            # (on the downscaled image, so the marker keeps its size and
+            # the coordinates in the prompt match the image sent)
+            max_dim = SCREENSHOT_MAX_DIM if self.token_efficient_mode else SCREENSHOT_PNG_MAX_DIM
+            marked_screenshot = downscale_for_vision(region, max_dim)
+            if marked_screenshot is screenshot:
+                marked_screenshot = screenshot.copy()
+            marker_size = 20
+            marker_width = 5
+            if marked_screenshot.width != region.width:
+                scale = marked_screenshot.width / region.width
+                x, y = int(x * scale), int(y * scale)
+                marker_size = max(8, int(marker_size * scale))
+                marker_width = max(2, int(marker_width * scale))
+            
             from PIL import ImageDraw
             draw = ImageDraw.Draw(marked_screenshot)
-            marker_size = 20
             draw.ellipse(
                 [x - marker_size, y - marker_size, x + marker_size, y + marker_size],
                 outline='red',
-                width=5
+                width=marker_width
             )
             marked_img_b64 = self._encode_image(marked_screenshot)
             
-            prompt = f"""A user clicked at coordinates ({x}, {y}) on this screen (marked with red circle).
+            prompt = f"""A user clicked at coordinates ({x}, {y}) in this part of the screen (marked with red circle).
 
 Please identify:
 1. What element was clicked? (button text, link text, icon name, etc.)
@@ -492,27 +616,21 @@ Examples:
 - Clicking "Submit" button → element_name: "Submit", parameterizable: []
 """
 
-            response = self.client.models.generate_content(
-                model=self.model,
+            content = self._generate_cached(
                 contents=[
                     {
                         "role": "user",
                         "parts": [
                             {"text": prompt},
-                            {"inline_data": {"mime_type": "image/png", "data": marked_img_b64}}
+                            {"inline_data": {"mime_type": self.image_mime_type, "data": marked_img_b64}}
                         ]
                     }
                 ],
-                config=GenerateContentConfig(temperature=0.1, max_output_tokens=512)
+                config=get_generation_config(temperature=0.1, max_output_tokens=512)
             )
             
-            content = response.text
-            
             # Extract JSON
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+            content = extract_json_text(content)
             
             return json.loads(content)
             
@@ -521,16 +639,62 @@ Examples:
                 print(f"   ⚠️  Gemini element identification failed: {e}")
             return None
     
+    def _generate_cached(self, contents, config: GenerateContentConfig) -> str:
+        """
+        Call Gemini and return the response text, using the on-disk cache
+        for requests that were already answered within LLM_CACHE_TTL_SECONDS.
+        """
+        cache_file = None
+        if self.use_llm_cache:
+            key_source = json.dumps([self.model, contents, repr(config)], sort_keys=True)
+            key = hashlib.blake2b(key_source.encode('utf-8'), digest_size=16).hexdigest()
+            cache_file = LLM_CACHE_DIR / f"{key}.json"
+            try:
+                with open(cache_file, 'r') as f:
+                    cached = json.load(f)
+                if time.time() - cached['created'] < LLM_CACHE_TTL_SECONDS:
+                    return cached['text']
+            except (OSError, ValueError, KeyError):
+                pass
+        
+        response = self.client.models.generate_content(
+            model=self.model,
+            contents=contents,
+            config=config
+        )
+        text = response.text
+        
+        if cache_file is not None and text:
+            try:
+                LLM_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                tmp_file = cache_file.with_suffix('.tmp')
+                with open(tmp_file, 'w') as f:
+                    json.dump({'created': time.time(), 'text': text}, f)
+                os.replace(tmp_file, cache_file)
+            except OSError:
+                pass
+            
+            # Keep the cache from growing without bound
+            if self._llm_cache_writes % LLM_CACHE_PRUNE_EVERY == 0:
+                _prune_llm_cache()
+            self._llm_cache_writes += 1
+        
+        return text
+    
     def _encode_image(self, image: Image.Image) -> str:
         """Encode PIL image to base64"""
         if image.mode == 'RGBA':
             image = image.convert('RGB')
         
         buffer = io.BytesIO()
-        image.save(buffer, format="PNG", optimize=True)
-        buffer.seek(0)
+        if self.token_efficient_mode:
+            image = downscale_for_vision(image)
+            image.save(buffer, format="JPEG", quality=SCREENSHOT_JPEG_QUALITY)
+        else:
+            image = downscale_for_vision(image, SCREENSHOT_PNG_MAX_DIM)
+            image.save(buffer, format="PNG", compress_level=SCREENSHOT_PNG_COMPRESS_LEVEL)
         
-        return base64.b64encode(buffer.read()).decode('utf-8')
+        return base64.b64encode(buffer.getbuffer()).decode('utf-8')
     
     def _identify_parameters(self, semantic_actions: List[Dict]) -> List[Dict]:
         """
@@ -605,13 +769,12 @@ Examples:
 Be specific but concise (max 10 words)."""
 
         try:
-            response = self.client.models.generate_content(
-                model=self.model,
+            content = self._generate_cached(
                 contents=prompt,
-                config=GenerateContentConfig(temperature=0.3, max_output_tokens=50)
+                config=get_generation_config(temperature=0.3, max_output_tokens=50)
             )
             
-            intention = response.text.strip()
+            intention = content.strip()
             # Clean up
             intention = intention.replace('"', '').replace("'", "").strip()
             return intention[:100]  # Max 100 chars
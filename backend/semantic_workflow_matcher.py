@@ -10,6 +10,15 @@ For demo with 3-5 workflows:
 
 import json
 import os
+import hashlib
+import importlib.util
+import platform
+import queue
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future
+from functools import lru_cache
 from typing import List, Dict, Tuple, Optional
 from pathlib import Path
 
@@ -20,9 +29,149 @@ except:
     SNOWFLAKE_AVAILABLE = False
     from visual_memory import VisualWorkflowMemory
 
+# Faster JSON parsing when available
+try:
+    import orjson
+    _loads_json = orjson.loads
+except:
+    _loads_json = json.loads
+
+# Optional local embeddings - lets clear matches skip the Gemini ranking call.
+# sentence_transformers pulls in PyTorch, so it is only imported on first use.
+try:
+    import numpy as np
+    EMBEDDINGS_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+except:
+    EMBEDDINGS_AVAILABLE = False
+
+# int8-quantized ONNX Runtime build of the embedding model (optional) -
+# several times faster than the PyTorch model on CPU
+try:
+    ONNX_AVAILABLE = importlib.util.find_spec("onnxruntime") is not None
+except:
+    ONNX_AVAILABLE = False
+
 # Import hardcoded templates
 from workflow_templates import WORKFLOW_TEMPLATES
 
+# Embedding model used for the local pre-ranking
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Quantized exports shipped in the model's repo, loaded with
+# sentence-transformers' ONNX backend. AGENTFLOW_EMBEDDING_BACKEND=torch
+# forces the PyTorch model.
+EMBEDDING_ONNX_FILE_ARM64 = "onnx/model_qint8_arm64.onnx"
+EMBEDDING_ONNX_FILE_AVX512_VNNI = "onnx/model_qint8_avx512_vnni.onnx"
+EMBEDDING_ONNX_FILE_AVX2 = "onnx/model_quint8_avx2.onnx"
+
+
+def _cpu_has_avx512_vnni() -> bool:
+    """Whether the CPU reports AVX-512 VNNI (most Intel Macs are AVX2-only)"""
+    try:
+        if sys.platform == 'darwin':
+            features = subprocess.run(
+                ['sysctl', '-n', 'machdep.cpu.leaf7_features'],
+                capture_output=True, text=True, timeout=2
+            ).stdout
+            return 'AVX512VNNI' in features.upper()
+        if sys.platform.startswith('linux'):
+            with open('/proc/cpuinfo') as f:
+                return 'avx512_vnni' in f.read()
+    except Exception:
+        pass
+    return False
+
+
+@lru_cache(maxsize=None)
+def _embedding_onnx_file() -> str:
+    """
+    ONNX export matching this CPU. A VNNI build still loads on a CPU without
+    VNNI - it just runs with int8 saturation and loses accuracy - so x86 only
+    gets it when the CPU reports the instructions.
+    """
+    if platform.machine().lower() in ('arm64', 'aarch64'):
+        return EMBEDDING_ONNX_FILE_ARM64
+    if _cpu_has_avx512_vnni():
+        return EMBEDDING_ONNX_FILE_AVX512_VNNI
+    return EMBEDDING_ONNX_FILE_AVX2
+
+# Texts per forward pass when encoding workflows (encode() already groups
+# texts of similar length, so each batch carries little padding)
+EMBEDDING_BATCH_SIZE = 32
+# Distinct prompts whose embeddings are kept in memory (users repeat commands)
+QUERY_EMBEDDING_CACHE_SIZE = 256
+
+# With many workflows, candidates are shortlisted on a PCA projection and
+# only the shortlist gets exact cosine scores
+PCA_MIN_WORKFLOWS = 256
+PCA_COMPONENTS = 128
+PCA_SHORTLIST = 32
+
+# Workflow embeddings persisted across runs, keyed by model + text
+EMBEDDING_CACHE_DIR = Path.home() / ".agentflow" / "embedding_cache"
+
+# A local match is trusted without asking Gemini when its cosine similarity
+# is at least this high and clearly ahead of the runner-up
+CONFIDENT_MATCH_SCORE = 0.75
+CONFIDENT_MATCH_MARGIN = 0.10
+
+
+def _normalize_name(text: str) -> str:
+    """Case/whitespace/trailing-punctuation-insensitive form of a name or request"""
+    return ' '.join(text.lower().split()).rstrip('.!?')
+
+
+class QueryEmbeddingBatcher:
+    """
+    Encodes query texts on a background thread.
+    
+    Queries submitted while an encode is running are coalesced into the
+    next model call (up to max_batch), so concurrent requests share one
+    forward pass instead of queueing one by one. A lone query is encoded
+    immediately - there is no batching delay.
+    """
+    
+    def __init__(self, encode_batch, max_batch: int = 8):
+        """
+        Args:
+            encode_batch: Function mapping a list of texts to a list of embeddings
+            max_batch: Most queries encoded in one call
+        """
+        self._encode_batch = encode_batch
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+    
+    def submit(self, text: str) -> Future:
+        """Queue a text for encoding; the future resolves to its embedding"""
+        future = Future()
+        self._queue.put((text, future))
+        
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-embedding", daemon=True)
+                self._thread.start()
+        return future
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                vectors = self._encode_batch([text for text, _ in batch])
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+
 class SemanticWorkflowMatcher:
     """
     Match user prompts to stored workflows using Gemini
@@ -56,16 +205,76 @@ class SemanticWorkflowMatcher:
             print("   Using: Local storage + Gemini matching")
         
         # Initialize Gemini client for matching
-        from google import genai
-        from google.genai.types import GenerateContentConfig
+        from gemini_client import get_gemini_client
         
         self.api_key = os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             print("⚠️  GOOGLE_API_KEY not set - matching will fail!")
             self.gemini_client = None
         else:
-            self.gemini_client = genai.Client(api_key=self.api_key)
+            self.gemini_client = get_gemini_client(self.api_key)
             self.model = "gemini-2.0-flash"
+        
+        # Local embedding model (loaded lazily) + cached workflow embeddings
+        self._embedding_model = None
+        self._embedding_model_failed = not EMBEDDINGS_AVAILABLE
+        self._embedding_model_lock = threading.Lock()
+        # Which weights are loaded ("torch" or the ONNX file) - quantized
+        # embeddings differ slightly, so the disk cache is keyed on it
+        self._embedding_variant = "torch"
+        # workflow_id -> (searchable text, normalized embedding)
+        self._embedding_cache = {}
+        # Stacked (N, D) matrix of the cached rows, in _workflow_ids order
+        self._emb_matrix = None
+        self._workflow_ids = []
+        # Workflow list the matrix was last built from
+        self._emb_workflows = None
+        # (workflow list, its formatted text for the Gemini ranking prompt)
+        self._workflow_text_cache = (None, '')
+        # (workflow list, normalized name -> workflow)
+        self._name_index_cache = (None, {})
+        # (mean, basis, projected matrix) once there are PCA_MIN_WORKFLOWS rows
+        self._reduction = None
+        self._pca_fit_size = 0
+        self._embedding_lock = threading.Lock()
+        
+        # Templates + ready workflows, reused until the memory's version changes
+        self._workflows_cache = None
+        self._workflows_cache_version = None
+        
+        # Encodes queries (batched) while workflows are being listed
+        # prompt -> normalized embedding (only touched on the batcher thread)
+        self._query_embedding_cache = {}
+        self._query_batcher = QueryEmbeddingBatcher(self._encode_queries)
+        self._query_path_warm = False
+    
+    @property
+    def embedding_model(self):
+        """Sentence embedding model, loaded on first use (None if unavailable)"""
+        if self._embedding_model is None and not self._embedding_model_failed:
+            with self._embedding_model_lock:
+                if self._embedding_model is None and not self._embedding_model_failed:
+                    try:
+                        from sentence_transformers import SentenceTransformer
+                        model = None
+                        if ONNX_AVAILABLE and os.getenv("AGENTFLOW_EMBEDDING_BACKEND", "onnx") == "onnx":
+                            onnx_file = _embedding_onnx_file()
+                            try:
+                                model = SentenceTransformer(
+                                    EMBEDDING_MODEL_NAME,
+                                    backend="onnx",
+                                    model_kwargs={"file_name": onnx_file}
+                                )
+                                self._embedding_variant = onnx_file
+                            except Exception as e:
+                                print(f"⚠️  Quantized embedding model unavailable, using PyTorch: {e}")
+                        if model is None:
+                            model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+                        self._embedding_model = model
+                    except Exception as e:
+                        print(f"⚠️  Could not load embedding model: {e}")
+                        self._embedding_model_failed = True
+        return self._embedding_model
     
     def _create_searchable_text(self, workflow: Dict) -> str:
         """
@@ -103,25 +312,57 @@ class SemanticWorkflowMatcher:
         Returns:
             List of (workflow, similarity_score) tuples, sorted by score
         """
-        return self._find_with_gemini(user_prompt, top_k, min_similarity)
+        # The query embedding doesn't depend on the workflow list - compute it
+        # (and load the model, if needed) while workflows are being fetched
+        query_future = None
+        if not self._embedding_model_failed:
+            query_future = self._query_batcher.submit(user_prompt)
+        
+        all_workflows = self._get_all_workflows()
+        
+        if not all_workflows:
+            print("⚠️  No workflows or templates found")
+            return []
+        
+        # The user typed a workflow's exact name - nothing to rank
+        exact = self._find_exact_name(user_prompt, all_workflows)
+        if exact is not None:
+            print("   ⚡ Exact name match - skipping ranking")
+            return [(exact, 1.0)]
+        
+        # Deterministic first: a clear local embedding match needs no LLM call
+        local_matches = self._find_with_embeddings(query_future, all_workflows, top_k, min_similarity)
+        if local_matches is not None:
+            return local_matches
+        
+        return self._find_with_gemini(user_prompt, all_workflows, top_k, min_similarity)
     
-    def _find_with_gemini(self, 
-                          user_prompt: str, 
-                          top_k: int,
-                          min_similarity: float) -> List[Tuple[Dict, float]]:
+    def _find_exact_name(self, user_prompt: str, all_workflows: List[Dict]) -> Optional[Dict]:
         """
-        Find similar workflows using Gemini (optimized for small datasets)
-        
-        Perfect for demos with 3-5 workflows:
-        - Pulls all workflows from Snowflake
-        - Gemini ranks them semantically
-        - Fast and accurate
+        Workflow whose name is the prompt itself (ignoring case, spacing and
+        trailing punctuation), or None. Templates win ties, as in ranking.
         """
-        if not self.gemini_client:
-            print("❌ Gemini client not initialized")
-            return []
+        cached_workflows, index = self._name_index_cache
+        if all_workflows is not cached_workflows:
+            index = {}
+            for wf in all_workflows:
+                name = _normalize_name(wf.get('workflow_name', wf.get('name', '')) or '')
+                if name:
+                    index.setdefault(name, wf)
+            self._name_index_cache = (all_workflows, index)
+        return index.get(_normalize_name(user_prompt))
+    
+    def _get_all_workflows(self) -> List[Dict]:
+        """
+        Learned workflows plus hardcoded templates (templates first).
         
-        from google.genai.types import GenerateContentConfig
+        Cached while the memory's version is unchanged, so repeat requests
+        don't re-read every workflow's metadata. Backends without a version
+        counter (Snowflake) are queried every time.
+        """
+        version = getattr(self.memory, 'version', None)
+        if version is not None and self._workflows_cache is not None and version == self._workflows_cache_version:
+            return self._workflows_cache
         
         # Get ALL workflows (fine for 3-5 workflows)
         workflows = self.memory.list_workflows(status='ready')
@@ -143,10 +384,245 @@ class SemanticWorkflowMatcher:
         # Combine templates with learned workflows
         # Templates go first so they have priority in matching
         all_workflows = template_workflows + workflows
+        self._workflows_cache = all_workflows
+        self._workflows_cache_version = version
+        return all_workflows
+    
+    def _get_workflow_embeddings(self, all_workflows: List[Dict]):
+        """
+        Normalized workflow embeddings, one row per workflow.
         
-        if not all_workflows:
-            print("⚠️  No workflows or templates found")
-            return []
+        Each workflow is encoded once and cached by workflow_id; only new
+        workflows (or ones whose name/description/tags changed) are encoded.
+        """
+        with self._embedding_lock:
+            # _get_all_workflows() returns the same list until memory changes,
+            # so the per-workflow text check can be skipped entirely
+            if self._emb_matrix is not None and all_workflows is self._emb_workflows:
+                return self._emb_matrix
+            
+            stale = []
+            for wf in all_workflows:
+                text = self._create_searchable_text(wf)
+                cached = self._embedding_cache.get(wf['workflow_id'])
+                if cached is None or cached[0] != text:
+                    stale.append((wf['workflow_id'], text))
+            
+            # Embeddings from earlier runs are loaded from disk (once the
+            # model is loaded, so they match its variant)
+            if stale:
+                self.embedding_model
+            to_encode = []
+            for workflow_id, text in stale:
+                vector = self._load_cached_embedding(text)
+                if vector is not None:
+                    self._embedding_cache[workflow_id] = (text, vector)
+                else:
+                    to_encode.append((workflow_id, text))
+            
+            if to_encode:
+                vectors = self._encode_texts(self.embedding_model, [text for _, text in to_encode])
+                for (workflow_id, text), vector in zip(to_encode, vectors):
+                    self._embedding_cache[workflow_id] = (text, vector)
+                    self._save_cached_embedding(text, vector)
+            
+            # Drop workflows that have been deleted
+            if len(self._embedding_cache) > len(all_workflows):
+                current = {wf['workflow_id'] for wf in all_workflows}
+                self._embedding_cache = {
+                    workflow_id: entry for workflow_id, entry in self._embedding_cache.items()
+                    if workflow_id in current
+                }
+            
+            # Restack only when rows changed; scoring is then a single matmul
+            workflow_ids = [wf['workflow_id'] for wf in all_workflows]
+            if stale or self._emb_matrix is None or workflow_ids != self._workflow_ids:
+                # Contiguous float32 rows so scoring is a single BLAS GEMV
+                self._emb_matrix = np.ascontiguousarray(
+                    np.stack([self._embedding_cache[wid][1] for wid in workflow_ids]),
+                    dtype=np.float32
+                )
+                self._workflow_ids = workflow_ids
+                self._update_reduction()
+            
+            self._emb_workflows = all_workflows
+            return self._emb_matrix
+    
+    def _update_reduction(self):
+        """
+        Project the embedding matrix onto its top principal components.
+        
+        The basis is refit only when the workflow count has doubled since
+        the last fit; otherwise new rows are projected onto the old basis.
+        """
+        matrix = self._emb_matrix
+        if len(matrix) < PCA_MIN_WORKFLOWS:
+            self._reduction = None
+            self._pca_fit_size = 0
+            return
+        
+        if self._reduction is None or len(matrix) >= 2 * self._pca_fit_size:
+            mean = matrix.mean(axis=0)
+            _, _, vt = np.linalg.svd(matrix - mean, full_matrices=False)
+            basis = np.ascontiguousarray(vt[:PCA_COMPONENTS].T)
+            self._pca_fit_size = len(matrix)
+        else:
+            mean, basis, _ = self._reduction
+        
+        self._reduction = (mean, basis, (matrix - mean) @ basis)
+    
+    def _embedding_cache_file(self, text: str) -> Path:
+        model_key = EMBEDDING_MODEL_NAME
+        if self._embedding_variant != "torch":
+            model_key = f"{EMBEDDING_MODEL_NAME}/{self._embedding_variant}"
+        key = hashlib.blake2b(f"{model_key}\0{text}".encode('utf-8'), digest_size=16).hexdigest()
+        return EMBEDDING_CACHE_DIR / f"{key}.npy"
+    
+    def _load_cached_embedding(self, text: str):
+        """Embedding of text saved by an earlier run, or None"""
+        try:
+            return np.load(self._embedding_cache_file(text))
+        except (OSError, ValueError):
+            return None
+    
+    def _save_cached_embedding(self, text: str, vector):
+        """Persist an embedding (best effort - the cache is only an optimization)"""
+        cache_file = self._embedding_cache_file(text)
+        try:
+            EMBEDDING_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'wb') as f:
+                np.save(f, vector)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+    
+    def forget_workflow(self, workflow_id: str):
+        """Drop a workflow's cached embedding (e.g. after it was re-recorded)"""
+        with self._embedding_lock:
+            self._embedding_cache.pop(workflow_id, None)
+            self._emb_matrix = None
+    
+    def warm_embeddings(self):
+        """
+        Encode all workflows ahead of the first request.
+        Safe to run in a background thread while waiting for user input.
+        """
+        if self.embedding_model is None:
+            return
+        try:
+            self._get_workflow_embeddings(self._get_all_workflows())
+            
+            # Start the batcher thread and run the model's (slow) first
+            # inference now rather than on the first real request
+            if not self._query_path_warm:
+                self._query_batcher.submit("warmup").result()
+                self._query_path_warm = True
+        except Exception as e:
+            print(f"⚠️  Embedding warmup failed: {e}")
+    
+    def _encode_queries(self, texts: List[str]):
+        """Normalized embeddings of user prompts (all None without a model)"""
+        model = self.embedding_model
+        if model is None:
+            return [None] * len(texts)
+        
+        # Repeated prompts (and the warmup text) are encoded only once
+        cache = self._query_embedding_cache
+        found = {text: cache[text] for text in texts if text in cache}
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            for text, vector in zip(missing, self._encode_texts(model, missing)):
+                found[text] = vector
+                if len(cache) >= QUERY_EMBEDDING_CACHE_SIZE:
+                    cache.pop(next(iter(cache)))
+                cache[text] = vector
+        return [found[text] for text in texts]
+    
+    @staticmethod
+    def _encode_texts(model, texts: List[str]):
+        """
+        Normalized (N, D) embeddings in one batched encode() call.
+        Normalized rows make cosine similarity a plain dot product.
+        """
+        return model.encode(
+            texts,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+    
+    def _find_with_embeddings(self,
+                              query_future: Optional[Future],
+                              all_workflows: List[Dict],
+                              top_k: int,
+                              min_similarity: float) -> Optional[List[Tuple[Dict, float]]]:
+        """
+        Rank workflows by cosine similarity of sentence embeddings.
+        
+        Args:
+            query_future: Pending query embedding from the batcher (None to skip)
+        
+        Returns:
+            Ranked matches if the best one is a confident, unambiguous match,
+            otherwise None (caller falls back to Gemini ranking)
+        """
+        if query_future is None:
+            return None
+        
+        try:
+            query = query_future.result()
+            if query is None:
+                return None
+            query = np.asarray(query, dtype=np.float32)
+            
+            embeddings = self._get_workflow_embeddings(all_workflows)
+            reduction = self._reduction
+            
+            if reduction is None or len(reduction[2]) != len(embeddings):
+                scores = embeddings @ query
+            else:
+                # Shortlist in the reduced space, exact cosine for the shortlist
+                # only (the confidence thresholds apply to exact scores)
+                mean, basis, reduced = reduction
+                approx = reduced @ ((query - mean) @ basis)
+                shortlist = np.argpartition(-approx, PCA_SHORTLIST)[:PCA_SHORTLIST]
+                scores = np.full(len(embeddings), -np.inf, dtype=np.float32)
+                scores[shortlist] = embeddings[shortlist] @ query
+            
+            # Only the top few are needed (top_k, plus a runner-up for the margin)
+            keep = max(top_k, 2)
+            if len(scores) > keep:
+                top = np.argpartition(-scores, keep - 1)[:keep]
+                order = top[np.argsort(-scores[top])]
+            else:
+                order = np.argsort(-scores)
+            best = float(scores[order[0]])
+            runner_up = float(scores[order[1]]) if len(order) > 1 else 0.0
+            
+            if best < CONFIDENT_MATCH_SCORE or best - runner_up < CONFIDENT_MATCH_MARGIN:
+                return None
+            
+            print(f"   ⚡ Confident local match ({best:.0%}) - skipping Gemini ranking")
+            return [
+                (all_workflows[i], float(scores[i]))
+                for i in order[:top_k]
+                if scores[i] >= min_similarity
+            ]
+        except Exception as e:
+            print(f"⚠️  Embedding match failed, falling back to Gemini: {e}")
+            return None
+    
+    def _format_workflow_list(self, all_workflows: List[Dict]) -> str:
+        """
+        Numbered workflow list for the Gemini ranking prompt.
+        
+        Reused while _get_all_workflows() returns the same (cached) list.
+        """
+        cached_workflows, cached_text = self._workflow_text_cache
+        if all_workflows is cached_workflows:
+            return cached_text
         
         # Create workflow list for Gemini with rich context
         workflow_list = []
@@ -167,6 +643,29 @@ class SemanticWorkflowMatcher:
             workflow_list.append(workflow_info)
         
         workflow_text = '\n'.join(workflow_list)
+        self._workflow_text_cache = (all_workflows, workflow_text)
+        return workflow_text
+    
+    def _find_with_gemini(self, 
+                          user_prompt: str, 
+                          all_workflows: List[Dict],
+                          top_k: int,
+                          min_similarity: float) -> List[Tuple[Dict, float]]:
+        """
+        Find similar workflows using Gemini (optimized for small datasets)
+        
+        Perfect for demos with 3-5 workflows:
+        - Pulls all workflows from Snowflake
+        - Gemini ranks them semantically
+        - Fast and accurate
+        """
+        if not self.gemini_client:
+            print("❌ Gemini client not initialized")
+            return []
+        
+        from gemini_client import get_generation_config, debug_traceback
+        
+        workflow_text = self._format_workflow_list(all_workflows)
         
         # Ask Gemini to rank workflows
         prompt = f"""User request: "{user_prompt}"
@@ -192,18 +691,11 @@ Rules:
             response = self.gemini_client.models.generate_content(
                 model=self.model,
                 contents=prompt,
-                config=GenerateContentConfig(temperature=0.1, max_output_tokens=1024)
+                config=get_generation_config(temperature=0.1, max_output_tokens=1024, response_mime_type="application/json")
             )
             
-            content = response.text
-            
-            # Extract JSON
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            rankings = json.loads(content)
+            # JSON mime type - the response is bare JSON, no code fences
+            rankings = _loads_json(response.text)
             
             # Convert to workflow objects
             results = []
@@ -218,8 +710,7 @@ Rules:
             
         except Exception as e:
             print(f"❌ Gemini matching failed: {e}")
-            import traceback
-            traceback.print_exc()
+            debug_traceback(e)
             return []
     
     def explain_match(self, user_prompt: str, workflow: Dict, similarity: float) -> str:
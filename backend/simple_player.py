@@ -9,6 +9,7 @@ import time
 import pyautogui
 import sys
 import os
+import select
 from typing import Dict, Any
 
 
@@ -47,6 +48,23 @@ class SimplePlayer:
                 print("   Coordinates may not be accurate!")
                 print()
     
+    def _wait_for_enter(self, timeout: float) -> bool:
+        """Sleep up to timeout seconds; returns True early if Enter was pressed"""
+        try:
+            ready, _, _ = select.select([sys.stdin], [], [], timeout)
+        except (OSError, ValueError):
+            # stdin not selectable (Windows, closed/redirected stdin)
+            time.sleep(timeout)
+            return False
+        if ready:
+            # Raw read of the fd select() polled - sys.stdin.readline() could
+            # leave extra input in its buffer where select() can't see it
+            if os.read(sys.stdin.fileno(), 1024):
+                return True
+            # EOF - nothing to wait on, keep the normal countdown
+            time.sleep(timeout)
+        return False
+    
     def play(self, dry_run: bool = False):
         """Play the workflow"""
         if dry_run:
@@ -56,12 +74,13 @@ class SimplePlayer:
         print("=" * 70)
         print("🎬 STARTING PLAYBACK")
         print("=" * 70)
-        print("You have 3 seconds to focus the correct window...")
+        print("You have 3 seconds to focus the correct window... (Enter to start now)")
         print()
         
         for i in range(3, 0, -1):
             print(f"  {i}...")
-            time.sleep(1)
+            if self._wait_for_enter(1):
+                break
         
         print("\n▶️  Playing workflow...\n")
         
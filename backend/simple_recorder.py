@@ -8,6 +8,7 @@ import json
 import time
 import pyautogui
 from pynput import mouse, keyboard
+from collections import deque
 from datetime import datetime
 from typing import List, Dict, Any
 import os
@@ -23,7 +24,7 @@ class SimpleRecorder:
         self.last_action_time = time.time()
         
         # Track last 4 characters to detect "stop"
-        self.recent_chars = []
+        self.recent_chars = deque(maxlen=4)
         
         # Listeners
         self.mouse_listener = None
@@ -138,8 +139,6 @@ class SimpleRecorder:
                 
                 # Track recent characters to detect "stop"
                 self.recent_chars.append(key.char)
-                if len(self.recent_chars) > 4:
-                    self.recent_chars.pop(0)
                 
                 # Check if last 4 characters spell "stop"
                 if ''.join(self.recent_chars) == 'stop':
@@ -179,6 +178,7 @@ class SimpleRecorder:
         description = input("Description (optional): ").strip()
         
         # Save workflow
+        screen_size = pyautogui.size()
         workflow = {
             "name": name,
             "description": description,
@@ -186,8 +186,8 @@ class SimpleRecorder:
             "duration": round(duration, 2),
             "actions": self.actions,
             "screen_resolution": {
-                "width": pyautogui.size().width,
-                "height": pyautogui.size().height
+                "width": screen_size.width,
+                "height": screen_size.height
             }
         }
         
@@ -4,13 +4,15 @@ Working Snowflake integration with PASSWORD authentication
 import os
 import json
 import uuid
+import importlib.util
 from typing import Dict, List, Optional
 from datetime import datetime
 from dotenv import load_dotenv
 
+# The connector is slow to import - only check that it's installed here,
+# and import it when a connection is actually made
 try:
-    import snowflake.connector
-    SNOWFLAKE_AVAILABLE = True
+    SNOWFLAKE_AVAILABLE = importlib.util.find_spec("snowflake.connector") is not None
 except ImportError:
     SNOWFLAKE_AVAILABLE = False
 
@@ -41,6 +43,7 @@ class SnowflakeWorkflowMemory:
     
     def _connect(self):
         """Connect with password"""
+        import snowflake.connector
         self.conn = snowflake.connector.connect(
             account=self.account,
             user=self.user,
@@ -0,0 +1,122 @@
+"""
+Test Click Region Cropping
+
+Verify that recorded clicks (logical points) are mapped into Retina
+screenshots (physical pixels) and that the crop sent to Gemini contains them
+"""
+
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from semantic_action_analyzer import click_roi, click_image_point, CLICK_ROI_SIZE
+
+
+# 1440x900 logical screen captured at 2x
+SCREEN_SIZE = (1440, 900)
+RETINA_IMAGE_SIZE = (2880, 1800)
+
+
+def _click_step(x: int, y: int, screen_size=SCREEN_SIZE) -> dict:
+    """A click step as WorkflowRecorder stores it"""
+    screen_w, screen_h = screen_size
+    return {
+        'action_data': {
+            'x': x,
+            'y': y,
+            'normalized_x': int(x * 1000 // screen_w),
+            'normalized_y': int(y * 1000 // screen_h),
+        },
+        'visual_context': {'screen_size': list(screen_size)}
+    }
+
+
+def test_click_roi_bounds():
+    """Test that the region is centered on the click and clamped to the image"""
+    print("=" * 70)
+    print("TEST 1: Click Region Bounds")
+    print("=" * 70)
+
+    roi_w, roi_h = CLICK_ROI_SIZE
+
+    assert click_roi(RETINA_IMAGE_SIZE, 1440, 900) == (1440 - roi_w // 2, 900 - roi_h // 2,
+                                                       1440 + roi_w // 2, 900 + roi_h // 2)
+    print("✓ Centered on a click in the middle of the screen")
+
+    assert click_roi(RETINA_IMAGE_SIZE, 10, 10) == (0, 0, roi_w, roi_h)
+    assert click_roi(RETINA_IMAGE_SIZE, 2870, 1790) == (2880 - roi_w, 1800 - roi_h, 2880, 1800)
+    print("✓ Clamped at the corners, keeping its full size")
+
+    assert click_roi((1000, 700), 500, 300) == (0, 0, 1000, 700)
+    print("✓ Whole image when it is smaller than the region")
+
+    print("\n✅ Click region bounds test passed!\n")
+    return True
+
+
+def test_retina_click_scaling():
+    """Test that a logical click lands inside the crop of a 2x screenshot"""
+    print("=" * 70)
+    print("TEST 2: Retina Click Scaling")
+    print("=" * 70)
+
+    step = _click_step(1400, 850)
+    x, y = click_image_point(step, RETINA_IMAGE_SIZE)
+    assert (x, y) == (2800, 1700), (x, y)
+    print(f"✓ Logical (1400, 850) -> physical ({x}, {y})")
+
+    left, top, right, bottom = click_roi(RETINA_IMAGE_SIZE, x, y)
+    assert left <= x < right and top <= y < bottom, (left, top, right, bottom)
+    print(f"✓ Click inside region ({left}, {top}, {right}, {bottom})")
+
+    # Recordings without a screen size fall back to the normalized position
+    del step['visual_context']['screen_size']
+    x, y = click_image_point(step, RETINA_IMAGE_SIZE)
+    assert abs(x - 2800) <= 3 and abs(y - 1700) <= 2, (x, y)
+    print(f"✓ Normalized fallback -> physical ({x}, {y})")
+
+    # Non-Retina capture: image and screen sizes match
+    x, y = click_image_point(_click_step(1400, 850), SCREEN_SIZE)
+    assert (x, y) == (1400, 850), (x, y)
+    print("✓ 1x screenshot keeps logical coordinates")
+
+    print("\n✅ Retina click scaling test passed!\n")
+    return True
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "=" * 70)
+    print("🧪 CLICK REGION TEST SUITE")
+    print("=" * 70)
+    print()
+
+    all_passed = True
+
+    try:
+        all_passed &= test_click_roi_bounds()
+        all_passed &= test_retina_click_scaling()
+
+    except Exception as e:
+        print(f"\n❌ Test suite failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        all_passed = False
+
+    # Final result
+    print("\n" + "=" * 70)
+    if all_passed:
+        print("✅ ALL TESTS PASSED!")
+    else:
+        print("❌ SOME TESTS FAILED")
+    print("=" * 70)
+    print()
+
+    return all_passed
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,154 @@
+"""
+Test Visual Memory Persistence
+
+Verify that the workflow index journal replays after a restart, survives a
+torn last line, and is compacted back into index.json - and that debounced
+step metadata is written on flush
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from visual_memory import VisualWorkflowMemory, INDEX_JOURNAL_COMPACT_EVERY
+
+
+def test_journal_replay(tmp_path: Path):
+    """Test that journaled creates and deletes are replayed on reload"""
+    print("=" * 70)
+    print("TEST 1: Journal Replay")
+    print("=" * 70)
+
+    memory = VisualWorkflowMemory(storage_dir=tmp_path)
+    kept = memory.create_workflow("Open Canvas", "Open the Canvas dashboard")
+    dropped = memory.create_workflow("Open Gmail", "Open the Gmail inbox")
+    memory.delete_workflow(dropped)
+
+    assert memory.journal_file.exists(), "Changes should be journaled"
+    assert not memory.index_file.exists(), "Index should not be rewritten per change"
+    print("✓ Changes appended to journal, index.json untouched")
+
+    reloaded = VisualWorkflowMemory(storage_dir=tmp_path)
+    assert set(reloaded.index['workflows']) == {kept}, reloaded.index['workflows'].keys()
+    assert reloaded.index['workflows'][kept]['name'] == "Open Canvas"
+    print("✓ Reloaded index has the created workflow and not the deleted one")
+
+    print("\n✅ Journal replay test passed!\n")
+    return True
+
+
+def test_torn_journal_line(tmp_path: Path):
+    """Test that a partial last line (crash mid-append) is cut off"""
+    print("=" * 70)
+    print("TEST 2: Torn Journal Line")
+    print("=" * 70)
+
+    memory = VisualWorkflowMemory(storage_dir=tmp_path)
+    workflow_id = memory.create_workflow("Search Docs", "Search the docs")
+    valid_size = memory.journal_file.stat().st_size
+
+    with open(memory.journal_file, 'ab') as f:
+        f.write(b'{"op": "put", "workflow_id": "torn')
+
+    reloaded = VisualWorkflowMemory(storage_dir=tmp_path)
+    assert workflow_id in reloaded.index['workflows']
+    assert "torn" not in reloaded.index['workflows']
+    assert reloaded.journal_file.stat().st_size == valid_size, "Partial line should be truncated"
+    print("✓ Partial line dropped, earlier entries kept")
+
+    # Appends after the truncation must still replay
+    later_id = reloaded.create_workflow("Open Slack", "Open Slack")
+    assert later_id in VisualWorkflowMemory(storage_dir=tmp_path).index['workflows']
+    print("✓ Entries appended after truncation replay cleanly")
+
+    print("\n✅ Torn journal line test passed!\n")
+    return True
+
+
+def test_journal_compaction(tmp_path: Path):
+    """Test that the journal is folded into index.json after enough entries"""
+    print("=" * 70)
+    print("TEST 3: Journal Compaction")
+    print("=" * 70)
+
+    memory = VisualWorkflowMemory(storage_dir=tmp_path)
+    workflow_ids = [
+        memory.create_workflow(f"Workflow {i}", f"Test workflow {i}")
+        for i in range(INDEX_JOURNAL_COMPACT_EVERY)
+    ]
+
+    assert memory.index_file.exists(), "Index should be written on compaction"
+    assert not memory.journal_file.exists(), "Journal should be removed after compaction"
+    print(f"✓ Compacted after {INDEX_JOURNAL_COMPACT_EVERY} entries")
+
+    memory.delete_workflow(workflow_ids[0])
+    reloaded = VisualWorkflowMemory(storage_dir=tmp_path)
+    assert set(reloaded.index['workflows']) == set(workflow_ids[1:])
+    print("✓ Snapshot plus newer journal entries reload correctly")
+
+    print("\n✅ Journal compaction test passed!\n")
+    return True
+
+
+def test_metadata_flush(tmp_path: Path):
+    """Test that debounced step metadata is visible at once and written on flush"""
+    print("=" * 70)
+    print("TEST 4: Metadata Flush")
+    print("=" * 70)
+
+    memory = VisualWorkflowMemory(storage_dir=tmp_path)
+    workflow_id = memory.create_workflow("Open Notes", "Open the notes app")
+    for i in range(3):
+        memory.add_step(workflow_id, 'key_press', {'key': 'enter', 'index': i})
+
+    assert memory.get_workflow(workflow_id)['steps_count'] == 3
+    print("✓ Pending metadata served from memory")
+
+    memory.flush()
+    reloaded = VisualWorkflowMemory(storage_dir=tmp_path)
+    assert reloaded.get_workflow(workflow_id)['steps_count'] == 3
+    print("✓ Metadata written to disk on flush")
+
+    print("\n✅ Metadata flush test passed!\n")
+    return True
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "=" * 70)
+    print("🧪 VISUAL MEMORY PERSISTENCE TEST SUITE")
+    print("=" * 70)
+    print()
+
+    all_passed = True
+
+    try:
+        for test in (test_journal_replay, test_torn_journal_line,
+                     test_journal_compaction, test_metadata_flush):
+            with tempfile.TemporaryDirectory() as tmp:
+                all_passed &= test(Path(tmp))
+
+    except Exception as e:
+        print(f"\n❌ Test suite failed with error: {e}")
+        import traceback
+        traceback.print_exc()
+        all_passed = False
+
+    # Final result
+    print("\n" + "=" * 70)
+    if all_passed:
+        print("✅ ALL TESTS PASSED!")
+    else:
+        print("❌ SOME TESTS FAILED")
+    print("=" * 70)
+    print()
+
+    return all_passed
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
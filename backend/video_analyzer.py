@@ -11,8 +11,8 @@ import time
 import json
 from pathlib import Path
 from typing import Dict, List, Optional
-from google import genai
-from google.genai.types import GenerateContentConfig
+
+from gemini_client import get_gemini_client, get_generation_config, extract_json_text
 
 
 class VideoWorkflowAnalyzer:
@@ -22,7 +22,7 @@ class VideoWorkflowAnalyzer:
     The goal: Learn how the user does things, so the executor can mimic their style.
     """
 
-    def __init__(self, model: str = "gemini-2.0-flash", verbose: bool = True):
+    def __init__(self, model: str = "gemini-2.0-flash", verbose: bool = True, client=None):
         """
         Initialize video analyzer
 
@@ -31,6 +31,7 @@ class VideoWorkflowAnalyzer:
                    - "gemini-2.0-flash" (1M context, up to 1hr video)
                    - "gemini-2.5-flash" (experimental, best quality)
             verbose: Print detailed analysis
+            client: genai.Client to use (or the shared one)
         """
         self.verbose = verbose
         self.model = model
@@ -40,7 +41,7 @@ class VideoWorkflowAnalyzer:
         if not self.api_key:
             raise ValueError("GOOGLE_API_KEY environment variable required!")
 
-        self.client = genai.Client(api_key=self.api_key)
+        self.client = client or get_gemini_client(self.api_key)
 
         if self.verbose:
             print("✅ Video Workflow Analyzer initialized")
@@ -189,19 +190,13 @@ Begin analysis now."""
                         ]
                     }
                 ],
-                config=GenerateContentConfig(
-                    temperature=0.1,
-                    max_output_tokens=8192,
-                )
+                config=get_generation_config(temperature=0.1, max_output_tokens=8192)
             )
 
             content = response.text
 
             # Extract JSON
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+            content = extract_json_text(content)
 
             analysis = json.loads(content)
 
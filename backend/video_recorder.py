@@ -7,10 +7,14 @@ Uses avfoundation on macOS for smooth, stable recording
 import subprocess
 import time
 import signal
+import tempfile
 from pathlib import Path
 from typing import Optional
 from datetime import datetime
 
+# Only the end of ffmpeg's log is useful when reporting a failure
+FFMPEG_LOG_TAIL_BYTES = 4096
+
 
 class VideoRecorder:
     """
@@ -37,6 +41,7 @@ class VideoRecorder:
 
         self.is_recording = False
         self.ffmpeg_process = None
+        self.ffmpeg_log = None
         self.current_video_path = None
         self.start_time = None
 
@@ -119,12 +124,14 @@ class VideoRecorder:
         ]
 
         try:
+            # Log to a file rather than a pipe - ffmpeg writes progress for the
+            # whole recording and would stall once an unread pipe fills up
+            self.ffmpeg_log = tempfile.TemporaryFile()
             self.ffmpeg_process = subprocess.Popen(
                 ffmpeg_cmd,
                 stdin=subprocess.DEVNULL,
                 stdout=subprocess.DEVNULL,
-                stderr=subprocess.PIPE,  # Capture errors
-                text=True
+                stderr=self.ffmpeg_log,  # Capture errors
             )
         except FileNotFoundError:
             print("❌ ffmpeg not found! Please install:")
@@ -139,10 +146,11 @@ class VideoRecorder:
 
         # Check if process is still running (not immediately crashed)
         if self.ffmpeg_process.poll() is not None:
-            stderr = self.ffmpeg_process.stderr.read() if self.ffmpeg_process.stderr else ""
+            stderr = self._read_log_tail()
+            self._close_log()
             print(f"❌ ffmpeg failed to start properly")
             if stderr:
-                print(f"   Error: {stderr[:500]}")
+                print(f"   Error: {stderr[-500:]}")
             return None
 
         # Start recording
@@ -153,6 +161,26 @@ class VideoRecorder:
         print(f"   ✓ Using ffmpeg native screen capture (avfoundation)")
         return self.current_video_path
 
+    def _read_log_tail(self, max_bytes: int = FFMPEG_LOG_TAIL_BYTES) -> str:
+        """Last max_bytes of the ffmpeg log (where the actual error is)"""
+        if self.ffmpeg_log is None:
+            return ""
+        try:
+            size = self.ffmpeg_log.seek(0, 2)
+            self.ffmpeg_log.seek(max(0, size - max_bytes))
+            return self.ffmpeg_log.read().decode('utf-8', errors='replace').strip()
+        except Exception:
+            return ""
+
+    def _close_log(self):
+        """Discard the ffmpeg log file"""
+        if self.ffmpeg_log is not None:
+            try:
+                self.ffmpeg_log.close()
+            except Exception:
+                pass
+            self.ffmpeg_log = None
+
     def stop_recording(self) -> Optional[Path]:
         """
         Stop recording and save video
@@ -186,6 +214,8 @@ class VideoRecorder:
                 except:
                     pass
 
+            self._close_log()
+
         duration = time.time() - self.start_time
 
         print(f"⏹️  Recording stopped")
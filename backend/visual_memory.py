@@ -3,9 +3,16 @@ Visual Memory System for AgentFlow
 Stores workflows with visual context, screenshots, and action sequences
 """
 
+import os
 import json
+import re
 import time
+import atexit
+import shutil
+import threading
 import base64
+from collections import defaultdict
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 from datetime import datetime
@@ -14,6 +21,64 @@ import uuid
 from PIL import Image
 import io
 
+# Faster JSON (de)serialization when available
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    _ORJSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+except:
+    ORJSON_AVAILABLE = False
+
+
+_TOKEN_RE = re.compile(r'\w+')
+
+# Relevance weight of a query token found in each indexed field
+_SEARCH_FIELD_WEIGHTS = (('name', 1.0), ('description', 0.8), ('tags', 0.6))
+
+def _parse_json(data: bytes) -> Any:
+    """Parse JSON bytes (orjson when available)."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _read_json(path: Path) -> Any:
+    """Read a JSON file (orjson when available)."""
+    with open(path, 'rb') as f:
+        return _parse_json(f.read())
+
+
+def _dump_json(data: Any) -> bytes:
+    """Serialize to indented JSON bytes in a single pass (orjson when available)."""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(data, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass  # Something orjson can't handle - let json try
+    return json.dumps(data, indent=2).encode('utf-8')
+
+
+def _write_json(path: Path, data: Any):
+    """
+    Write JSON crash-safely: one large buffered write to a temp file,
+    fsync, then atomically rename it over the target.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb', buffering=1 << 18) as f:
+        f.write(_dump_json(data))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# Coalesce rapid metadata updates (one per recorded step) into one write
+METADATA_FLUSH_DELAY = 0.5
+
+# Index changes are appended to a journal; after this many entries the
+# journal is folded back into index.json
+INDEX_JOURNAL_COMPACT_EVERY = 50
+
 
 class VisualWorkflowMemory:
     """
@@ -35,27 +100,195 @@ class VisualWorkflowMemory:
         
         # Index file for quick lookup
         self.index_file = self.storage_dir / "index.json"
+        
+        # Append-only log of index changes since index.json was last written
+        self.journal_file = self.storage_dir / "index.journal.jsonl"
+        self._journal_entries = 0
         self.index = self._load_index()
+        
+        # Bumped on every change to the set of ready workflows, so callers
+        # can cache anything derived from them
+        self.version = 0
+        
+        # token -> {workflow_id: weight}, built lazily from the index
+        self._inverted_index = None
+        
+        # (workflow_id, use_count) of the most used workflow, tracked as
+        # usage is incremented (None = not computed yet)
+        self._most_used = None
+        
+        # Per-thread list_workflows results while inside snapshot()
+        self._snapshot_local = threading.local()
+        
+        # workflow_id -> ((mtime_ns, size), metadata) - skips re-parsing unchanged files
+        self._metadata_cache = {}
+        
+        # Metadata updated in memory but not yet written (see _mark_dirty)
+        self._dirty_metadata = {}
+        self._flush_timer = None
+        self._flush_lock = threading.RLock()
+        atexit.register(self.flush)
+        
+        # workflow_id -> (image, path) of the last step screenshot written
+        self._last_screenshot = {}
     
     def _load_index(self) -> Dict:
         """Load workflow index from disk."""
         if self.index_file.exists():
             try:
-                with open(self.index_file, 'r') as f:
-                    return json.load(f)
+                index = _read_json(self.index_file)
             except Exception as e:
                 print(f"Warning: Could not load index: {e}")
+                index = None
+        else:
+            index = None
+        
+        if index is None:
+            index = {
+                'workflows': {},
+                'last_updated': datetime.now().isoformat()
+            }
         
-        return {
-            'workflows': {},
-            'last_updated': datetime.now().isoformat()
-        }
+        self._journal_entries = self._replay_journal(index)
+        return index
+    
+    def _replay_journal(self, index: Dict) -> int:
+        """Apply journaled index changes on top of the index.json snapshot."""
+        if not self.journal_file.exists():
+            return 0
+        
+        count = 0
+        valid_bytes = 0
+        torn = False
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    record = _parse_json(line) if line.strip() else None
+                except ValueError:
+                    torn = True  # Partial last line from a crash mid-append
+                    break
+                valid_bytes += len(line)
+                
+                if record is None:
+                    continue
+                if record['op'] == 'put':
+                    index['workflows'][record['workflow_id']] = record['entry']
+                else:
+                    index['workflows'].pop(record['workflow_id'], None)
+                count += 1
+        
+        # Cut the partial line so later appends start on a clean line
+        if torn:
+            os.truncate(self.journal_file, valid_bytes)
+        return count
+    
+    def _journal_index_change(self, op: str, workflow_id: str, entry: Dict = None):
+        """
+        Record one index change ('put' or 'del') by appending a line,
+        instead of rewriting the whole index for every workflow.
+        """
+        record = {'op': op, 'workflow_id': workflow_id}
+        if entry is not None:
+            record['entry'] = entry
+        line = orjson.dumps(record) if ORJSON_AVAILABLE else json.dumps(record).encode('utf-8')
+        
+        with open(self.journal_file, 'ab') as f:
+            f.write(line + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_entries += 1
+        
+        if self._journal_entries >= INDEX_JOURNAL_COMPACT_EVERY:
+            self._save_index()
+        else:
+            self._inverted_index = None
+            self.version += 1
     
     def _save_index(self):
         """Save workflow index to disk."""
         self.index['last_updated'] = datetime.now().isoformat()
-        with open(self.index_file, 'w') as f:
-            json.dump(self.index, f, indent=2)
+        _write_json(self.index_file, self.index)
+        
+        # Snapshot now contains everything journaled (replay is idempotent,
+        # so a crash before this unlink is harmless)
+        if self._journal_entries:
+            self.journal_file.unlink(missing_ok=True)
+            self._journal_entries = 0
+        
+        # Search index is derived from the workflow index
+        self._inverted_index = None
+        self.version += 1
+    
+    def _build_inverted_index(self) -> Dict[str, Dict[str, float]]:
+        """Map each name/description/tag token to the workflows containing it."""
+        inverted = defaultdict(dict)
+        
+        for workflow_id, info in self.index['workflows'].items():
+            for field, weight in _SEARCH_FIELD_WEIGHTS:
+                text = info.get(field) or ''
+                if isinstance(text, list):
+                    text = ' '.join(text)
+                
+                for token in _TOKEN_RE.findall(text.lower()):
+                    postings = inverted[token]
+                    if weight > postings.get(workflow_id, 0.0):
+                        postings[workflow_id] = weight
+        
+        return dict(inverted)
+    
+    def _read_metadata(self, workflow_id: str) -> Optional[Dict]:
+        """
+        Load a workflow's metadata.json, reusing the parsed copy while the file is unchanged.
+        
+        Returns:
+            A fresh (shallow) copy of the metadata, or None if the file is missing
+        """
+        with self._flush_lock:
+            pending = self._dirty_metadata.get(workflow_id)
+            if pending is not None:
+                return dict(pending)
+        
+        metadata_file = self.storage_dir / workflow_id / "metadata.json"
+        try:
+            stat = metadata_file.stat()
+        except FileNotFoundError:
+            self._metadata_cache.pop(workflow_id, None)
+            return None
+        
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._metadata_cache.get(workflow_id)
+        if cached is None or cached[0] != signature:
+            cached = (signature, _read_json(metadata_file))
+            self._metadata_cache[workflow_id] = cached
+        
+        return dict(cached[1])
+    
+    def _mark_dirty(self, workflow_id: str, metadata: Dict):
+        """
+        Keep updated metadata in memory and write it after METADATA_FLUSH_DELAY.
+        Further updates within the window restart the timer, so a burst of
+        steps results in a single metadata.json write.
+        """
+        with self._flush_lock:
+            self._dirty_metadata[workflow_id] = metadata
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+            self._flush_timer = threading.Timer(METADATA_FLUSH_DELAY, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+    
+    def flush(self):
+        """Write any pending metadata updates to disk now."""
+        with self._flush_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            
+            for workflow_id, metadata in self._dirty_metadata.items():
+                metadata_file = self.storage_dir / workflow_id / "metadata.json"
+                if metadata_file.parent.exists():
+                    _write_json(metadata_file, metadata)
+            self._dirty_metadata = {}
     
     def create_workflow(self, name: str, description: str, tags: List[str] = None) -> str:
         """
@@ -86,18 +319,18 @@ class VisualWorkflowMemory:
         }
         
         # Save metadata
-        with open(workflow_dir / "metadata.json", 'w') as f:
-            json.dump(metadata, f, indent=2)
+        _write_json(workflow_dir / "metadata.json", metadata)
         
         # Add to index
-        self.index['workflows'][workflow_id] = {
+        entry = {
             'name': name,
             'description': description,
             'tags': tags or [],
             'created': timestamp,
             'path': str(workflow_dir)
         }
-        self._save_index()
+        self.index['workflows'][workflow_id] = entry
+        self._journal_index_change('put', workflow_id, entry)
         
         print(f"✅ Created workflow: {name} (ID: {workflow_id})")
         return workflow_id
@@ -124,9 +357,8 @@ class VisualWorkflowMemory:
         if not workflow_dir.exists():
             raise ValueError(f"Workflow {workflow_id} not found")
         
-        # Load metadata
-        with open(workflow_dir / "metadata.json", 'r') as f:
-            metadata = json.load(f)
+        # Load metadata (served from memory while recording)
+        metadata = self._read_metadata(workflow_id)
         
         # Step number
         step_num = metadata['steps_count'] + 1
@@ -145,26 +377,47 @@ class VisualWorkflowMemory:
         # Save screenshots
         if screenshot_before:
             before_path = workflow_dir / "steps" / f"{step_id}_before.png"
-            screenshot_before.save(before_path)
+            self._save_screenshot(workflow_id, screenshot_before, before_path)
             step_data['screenshot_before'] = str(before_path.name)
         
         if screenshot_after:
             after_path = workflow_dir / "steps" / f"{step_id}_after.png"
-            screenshot_after.save(after_path)
+            self._save_screenshot(workflow_id, screenshot_after, after_path)
             step_data['screenshot_after'] = str(after_path.name)
         
         # Save step data
         step_file = workflow_dir / "steps" / f"{step_id}.json"
-        with open(step_file, 'w') as f:
-            json.dump(step_data, f, indent=2)
+        _write_json(step_file, step_data)
         
-        # Update metadata
+        # Update metadata (written in the background, see _mark_dirty)
         metadata['steps_count'] = step_num
-        with open(workflow_dir / "metadata.json", 'w') as f:
-            json.dump(metadata, f, indent=2)
+        self._mark_dirty(workflow_id, metadata)
         
         print(f"  ✓ Added step {step_num}: {action_type}")
     
+    def _save_screenshot(self, workflow_id: str, image: Image.Image, path: Path):
+        """
+        Save a step screenshot as PNG.
+        
+        The recorder passes each step's "after" image as the next step's
+        "before", so an image that was just written is hard-linked (or
+        copied) to its new name instead of being PNG-encoded a second time.
+        """
+        last = self._last_screenshot.get(workflow_id)
+        if last is not None and last[0] is image:
+            try:
+                os.link(last[1], path)
+                return
+            except OSError:
+                try:
+                    shutil.copyfile(last[1], path)
+                    return
+                except OSError:
+                    pass
+        
+        image.save(path)
+        self._last_screenshot[workflow_id] = (image, path)
+    
     def finalize_workflow(self, workflow_id: str, parameters: List[Dict] = None, semantic_actions: List[Dict] = None):
         """
         Finalize a workflow recording and mark it ready for use.
@@ -176,9 +429,12 @@ class VisualWorkflowMemory:
         """
         workflow_dir = self.storage_dir / workflow_id
         
+        # Write out any pending step updates first
+        self.flush()
+        self._last_screenshot.pop(workflow_id, None)
+        
         # Load metadata
-        with open(workflow_dir / "metadata.json", 'r') as f:
-            metadata = json.load(f)
+        metadata = _read_json(workflow_dir / "metadata.json")
         
         # Update status
         metadata['status'] = 'ready'
@@ -194,12 +450,11 @@ class VisualWorkflowMemory:
             
             # Also save to separate file for easy access
             semantic_file = workflow_dir / "semantic_actions.json"
-            with open(semantic_file, 'w') as f:
-                json.dump(semantic_actions, f, indent=2)
+            _write_json(semantic_file, semantic_actions)
         
         # Save updated metadata
-        with open(workflow_dir / "metadata.json", 'w') as f:
-            json.dump(metadata, f, indent=2)
+        _write_json(workflow_dir / "metadata.json", metadata)
+        self.version += 1
         
         print(f"✅ Workflow finalized: {metadata['name']}")
         return metadata
@@ -212,16 +467,16 @@ class VisualWorkflowMemory:
             raise ValueError(f"Workflow {workflow_id} not found")
         
         # Load metadata
-        with open(workflow_dir / "metadata.json", 'r') as f:
-            metadata = json.load(f)
+        metadata = self._read_metadata(workflow_id)
+        if metadata is None:
+            raise ValueError(f"Workflow {workflow_id} not found")
         
         # Load all steps
         steps = []
         for i in range(1, metadata['steps_count'] + 1):
             step_file = workflow_dir / "steps" / f"step_{i:03d}.json"
             if step_file.exists():
-                with open(step_file, 'r') as f:
-                    steps.append(json.load(f))
+                steps.append(_read_json(step_file))
         
         metadata['steps'] = steps
         return metadata
@@ -237,6 +492,12 @@ class VisualWorkflowMemory:
         Returns:
             List of workflow metadata
         """
+        # Inside snapshot(): reuse the result for the same filter and version
+        snapshot = getattr(self._snapshot_local, 'results', None)
+        snapshot_key = (tuple(tags) if tags else None, status, self.version)
+        if snapshot is not None and snapshot_key in snapshot:
+            return [dict(metadata) for metadata in snapshot[snapshot_key]]
+        
         workflows = []
         
         for workflow_id, info in self.index['workflows'].items():
@@ -245,13 +506,9 @@ class VisualWorkflowMemory:
                 continue
             
             # Load full metadata for status check
-            workflow_dir = self.storage_dir / workflow_id
-            metadata_file = workflow_dir / "metadata.json"
+            metadata = self._read_metadata(workflow_id)
             
-            if metadata_file.exists():
-                with open(metadata_file, 'r') as f:
-                    metadata = json.load(f)
-                
+            if metadata is not None:
                 # Filter by status
                 if status and metadata.get('status') != status:
                     continue
@@ -260,8 +517,29 @@ class VisualWorkflowMemory:
         
         # Sort by created date
         workflows.sort(key=lambda x: x['created'], reverse=True)
+        
+        if snapshot is not None:
+            snapshot[snapshot_key] = [dict(metadata) for metadata in workflows]
         return workflows
     
+    @contextmanager
+    def snapshot(self):
+        """
+        Scope in which list_workflows is computed once per filter and reused.
+        
+        Wrap one interactive command so that every component asking for the
+        workflow list shares a single scan. Adding, finalizing or deleting a
+        workflow (a version change) still produces a fresh list.
+        """
+        outer = getattr(self._snapshot_local, 'results', None)
+        if outer is None:
+            self._snapshot_local.results = {}
+        try:
+            yield self
+        finally:
+            if outer is None:
+                self._snapshot_local.results = None
+    
     def search_workflows(self, query: str) -> List[Dict]:
         """
         Search workflows by name, description, or tags.
@@ -272,45 +550,102 @@ class VisualWorkflowMemory:
         Returns:
             List of matching workflows
         """
-        query_lower = query.lower()
+        tokens = set(_TOKEN_RE.findall(query.lower()))
+        if not tokens:
+            return []
+        
+        if self._inverted_index is None:
+            self._inverted_index = self._build_inverted_index()
+        
+        # Score = sum of field weights of matched query tokens
+        scores = defaultdict(float)
+        for token in tokens:
+            for workflow_id, weight in self._inverted_index.get(token, {}).items():
+                scores[workflow_id] += weight
+        
+        # Sort by relevance and only load metadata for the matches
         matches = []
+        for workflow_id, _ in sorted(scores.items(), key=lambda x: x[1], reverse=True):
+            metadata = self._read_metadata(workflow_id)
+            if metadata is not None:
+                matches.append(metadata)
         
-        for workflow in self.list_workflows():
-            # Search in name
-            if query_lower in workflow['name'].lower():
-                matches.append((workflow, 1.0))
-                continue
-            
-            # Search in description
-            if query_lower in workflow.get('description', '').lower():
-                matches.append((workflow, 0.8))
-                continue
-            
-            # Search in tags
-            if any(query_lower in tag.lower() for tag in workflow.get('tags', [])):
-                matches.append((workflow, 0.6))
+        return matches
+    
+    def lookup_by_keywords(self, keywords: List[str], status: str = None) -> List[str]:
+        """
+        Find workflows whose name, description or tags contain every keyword.
         
-        # Sort by relevance
-        matches.sort(key=lambda x: x[1], reverse=True)
-        return [m[0] for m in matches]
+        Args:
+            keywords: Words that must all appear (case-insensitive)
+            status: Filter by status (recording, ready, etc.)
+        
+        Returns:
+            Matching workflow IDs, newest first
+        """
+        if self._inverted_index is None:
+            self._inverted_index = self._build_inverted_index()
+        
+        # Intersect postings; only the survivors' metadata is read
+        candidates = None
+        for keyword in keywords:
+            postings = self._inverted_index.get(keyword.lower(), {})
+            candidates = set(postings) if candidates is None else candidates & postings.keys()
+            if not candidates:
+                return []
+        
+        workflows = self.index['workflows']
+        workflow_ids = sorted(candidates or (), key=lambda wid: workflows[wid]['created'], reverse=True)
+        
+        if status:
+            workflow_ids = [
+                workflow_id for workflow_id in workflow_ids
+                if (self._read_metadata(workflow_id) or {}).get('status') == status
+            ]
+        return workflow_ids
     
     def increment_usage(self, workflow_id: str):
         """Increment usage counter for a workflow."""
-        workflow_dir = self.storage_dir / workflow_id
-        metadata_file = workflow_dir / "metadata.json"
-        
-        with open(metadata_file, 'r') as f:
-            metadata = json.load(f)
+        metadata = self._read_metadata(workflow_id)
+        if metadata is None:
+            raise FileNotFoundError(f"Workflow {workflow_id} not found")
         
         metadata['use_count'] = metadata.get('use_count', 0) + 1
         metadata['last_used'] = datetime.now().isoformat()
         
-        with open(metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        if self._most_used is not None and metadata['use_count'] > self._most_used[1]:
+            self._most_used = (workflow_id, metadata['use_count'])
+        
+        # Batched with other metadata writes (see _mark_dirty)
+        self._mark_dirty(workflow_id, metadata)
+    
+    def get_most_used(self) -> Optional[Dict]:
+        """
+        Metadata of the most used workflow, or None if nothing has been used.
+        
+        One scan on first call; after that it is kept up to date by
+        increment_usage.
+        """
+        if self._most_used is None:
+            best = (None, 0)
+            for workflow_id in self.index['workflows']:
+                metadata = self._read_metadata(workflow_id)
+                if metadata is not None and metadata.get('use_count', 0) > best[1]:
+                    best = (workflow_id, metadata['use_count'])
+            self._most_used = best
+        
+        if self._most_used[0] is None:
+            return None
+        return self._read_metadata(self._most_used[0])
     
     def delete_workflow(self, workflow_id: str):
         """Delete a workflow and all its data."""
-        import shutil
+        with self._flush_lock:
+            self._dirty_metadata.pop(workflow_id, None)
+        self._last_screenshot.pop(workflow_id, None)
+        
+        if self._most_used is not None and self._most_used[0] == workflow_id:
+            self._most_used = None
         
         workflow_dir = self.storage_dir / workflow_id
         if workflow_dir.exists():
@@ -318,7 +653,7 @@ class VisualWorkflowMemory:
         
         if workflow_id in self.index['workflows']:
             del self.index['workflows'][workflow_id]
-            self._save_index()
+            self._journal_index_change('del', workflow_id)
         
         print(f"✅ Deleted workflow: {workflow_id}")
     
@@ -327,6 +662,7 @@ class VisualWorkflowMemory:
         import zipfile
         
         workflow_dir = self.storage_dir / workflow_id
+        self.flush()
         
         with zipfile.ZipFile(output_path, 'w') as zipf:
             for file in workflow_dir.rglob('*'):
@@ -350,27 +686,62 @@ class VisualWorkflowMemory:
             zipf.extractall(workflow_dir)
         
         # Load metadata and add to index
-        with open(workflow_dir / "metadata.json", 'r') as f:
-            metadata = json.load(f)
+        metadata = _read_json(workflow_dir / "metadata.json")
         
         metadata['workflow_id'] = workflow_id  # Update ID
         
-        with open(workflow_dir / "metadata.json", 'w') as f:
-            json.dump(metadata, f, indent=2)
+        _write_json(workflow_dir / "metadata.json", metadata)
         
-        self.index['workflows'][workflow_id] = {
+        entry = {
             'name': metadata['name'],
             'description': metadata['description'],
             'tags': metadata.get('tags', []),
             'created': metadata['created'],
             'path': str(workflow_dir)
         }
-        self._save_index()
+        self.index['workflows'][workflow_id] = entry
+        self._journal_index_change('put', workflow_id, entry)
         
         print(f"✅ Imported workflow: {metadata['name']} (ID: {workflow_id})")
         return workflow_id
 
 
+def print_workflow_list(memory) -> None:
+    """
+    Print the ready workflows in a memory backend.
+    
+    Lives here (not in the workflow system) so listing doesn't need the
+    Gemini/vision stack to be imported.
+    """
+    workflows = memory.list_workflows(status='ready')
+    
+    if not workflows:
+        print("\n📚 No learned workflows yet")
+        print("\n💡 Record your first workflow:")
+        print("   system.record_workflow('Close Jira Ticket')")
+        return
+    
+    print("\n" + "=" * 70)
+    print(f"📚 LEARNED WORKFLOWS ({len(workflows)} total)")
+    print("=" * 70)
+    
+    for i, wf in enumerate(workflows, 1):
+        print(f"\n{i}. {wf['name']}")
+        if wf.get('description'):
+            print(f"   {wf['description']}")
+        if wf.get('tags'):
+            print(f"   Tags: {', '.join(wf['tags'])}")
+        print(f"   Used: {wf.get('use_count', 0)} times")
+    
+    # Tracked incrementally by local storage (Snowflake has no equivalent)
+    if hasattr(memory, 'get_most_used'):
+        most_used = memory.get_most_used()
+        if most_used:
+            print(f"\n⭐ Most used: {most_used['name']} ({most_used.get('use_count', 0)} times)")
+    
+    print("\n" + "=" * 70)
+
+
 def test_visual_memory():
     """Test the visual memory system."""
     print("=" * 70)
@@ -11,26 +11,29 @@ Usage:
 
 import sys
 import argparse
-from intelligent_workflow_system import IntelligentWorkflowSystem
 
+# The workflow system (Gemini, vision, embeddings) is imported only by the
+# commands that need it - see main()
 
-def interactive_mode(system: IntelligentWorkflowSystem):
+
+def interactive_mode(system: "IntelligentWorkflowSystem"):
     """Interactive command-line mode"""
     system.demo_mode()
 
 
-def execute_prompt(system: IntelligentWorkflowSystem, prompt: str, auto: bool = False):
+def execute_prompt(system: "IntelligentWorkflowSystem", prompt: str, auto: bool = False):
     """Execute workflow from prompt"""
     success = system.execute_from_prompt(prompt, auto_execute=auto)
     sys.exit(0 if success else 1)
 
 
-def list_workflows(system: IntelligentWorkflowSystem):
-    """List all workflows"""
-    system.list_workflows()
+def list_workflows():
+    """List all workflows (local storage only - no Gemini client needed)"""
+    from visual_memory import VisualWorkflowMemory, print_workflow_list
+    print_workflow_list(VisualWorkflowMemory())
 
 
-def record_workflow(system: IntelligentWorkflowSystem, name: str, description: str = ""):
+def record_workflow(system: "IntelligentWorkflowSystem", name: str, description: str = ""):
     """Start recording a workflow"""
     print("\n⚠️  Note: Recording requires manual stop_recording() call")
     print("    Best used from Python REPL or notebook")
@@ -85,7 +88,13 @@ Examples:
     
     args = parser.parse_args()
     
+    # Listing only reads local storage
+    if args.command == 'list':
+        list_workflows()
+        return
+    
     # Initialize system
+    from intelligent_workflow_system import IntelligentWorkflowSystem
     try:
         system = IntelligentWorkflowSystem(verbose=args.verbose)
     except Exception as e:
@@ -102,9 +111,6 @@ Examples:
         prompt = ' '.join(args.args)
         execute_prompt(system, prompt, auto=args.auto)
     
-    elif args.command == 'list':
-        list_workflows(system)
-    
     elif args.command == 'record':
         if not args.args:
             print("❌ Error: record command requires a workflow name")
@@ -33,10 +33,13 @@ WORKFLOW_TEMPLATES: Dict[str, List[Dict]] = {
         },
         {
             "step_number": 2,
-            "semantic_type": "wait",
-            "description": "Wait for browser to fully open",
-            "target": None,
-            "value": "2.0",
+            "semantic_type": "wait_until",
+            "description": "Wait for browser to come to the front",
+            "target": "Brave Browser",
+            "value": "Brave Browser",
+            "condition": "app_frontmost",
+            "timeout": 5.0,
+            "poll_interval": 0.1,
             "timestamp_seconds": 2.0,
             "confidence": 1.0,
             "is_parameterizable": False,
@@ -88,10 +91,13 @@ WORKFLOW_TEMPLATES: Dict[str, List[Dict]] = {
         },
         {
             "step_number": 7,
-            "semantic_type": "wait",
+            "semantic_type": "wait_until",
             "description": "Wait for Workday to load",
-            "target": None,
-            "value": "3.0",
+            "target": "Brave Browser",
+            "value": "workday",
+            "condition": "url_contains",
+            "timeout": 5.0,
+            "poll_interval": 0.1,
             "timestamp_seconds": 7.0,
             "confidence": 1.0,
             "is_parameterizable": False,
@@ -119,7 +119,9 @@ class EnhancedRecorder:
 
     def _on_move(self, x, y):
         """Callback for mouse movement"""
-        if not self.is_recording:
+        # Fires for every pointer event - bail out before any work if
+        # movements aren't being recorded (last_mouse_pos is only used here)
+        if not self.is_recording or not self.record_movements:
             return
 
         # Sample movements to avoid too many data points
@@ -133,13 +135,12 @@ class EnhancedRecorder:
                abs(x - self.last_mouse_pos[0]) > 5 or \
                abs(y - self.last_mouse_pos[1]) > 5:
 
-                if self.record_movements:
-                    action = {
-                        'type': 'move',
-                        'x': round(x),
-                        'y': round(y)
-                    }
-                    self._record_action(action)
+                action = {
+                    'type': 'move',
+                    'x': round(x),
+                    'y': round(y)
+                }
+                self._record_action(action)
 
                 self.last_mouse_pos = (x, y)
 
@@ -148,34 +149,37 @@ class EnhancedRecorder:
         if not self.is_recording:
             return
 
+        # Round once - the pixel position is reused below
+        x, y = round(x), round(y)
+
         if pressed:
             # Mouse button pressed - might be start of drag
             action = {
                 'type': 'click_down',
-                'x': round(x),
-                'y': round(y),
+                'x': x,
+                'y': y,
                 'button': str(button)
             }
             self._record_action(action)
-            self.drag_start = (round(x), round(y))
+            self.drag_start = (x, y)
 
-            print(f"Click at ({round(x)}, {round(y)})")
+            print(f"Click at ({x}, {y})")
         else:
             # Mouse button released
             action = {
                 'type': 'click_up',
-                'x': round(x),
-                'y': round(y),
+                'x': x,
+                'y': y,
                 'button': str(button)
             }
             self._record_action(action)
 
             # Check if it was a drag
             if self.drag_start:
-                dx = abs(round(x) - self.drag_start[0])
-                dy = abs(round(y) - self.drag_start[1])
+                dx = abs(x - self.drag_start[0])
+                dy = abs(y - self.drag_start[1])
                 if dx > 10 or dy > 10:
-                    print(f"Drag detected: {self.drag_start} -> ({round(x)}, {round(y)})")
+                    print(f"Drag detected: {self.drag_start} -> ({x}, {y})")
 
             self.drag_start = None
 
@@ -6,6 +6,7 @@ Works on macOS using AppleScript
 import subprocess
 import json
 import re
+from datetime import datetime
 
 
 class WindowManager:
@@ -69,8 +70,7 @@ class WindowManager:
                 # Store raw output for potential restoration
                 windows.append({
                     'type': 'applescript_snapshot',
-                    'timestamp': subprocess.run(['date', '+%Y-%m-%d %H:%M:%S'],
-                                               capture_output=True, text=True).stdout.strip(),
+                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                     'data': output[:500]  # Store first 500 chars as reference
                 })
 
@@ -5,6 +5,20 @@ Diagnostic script to identify issues with AgentFlow
 
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+def check_imports(module_names):
+    """Import each module, returning (name, error or None) pairs"""
+    results = []
+    for module_name in module_names:
+        try:
+            __import__(module_name)
+            results.append((module_name, None))
+        except Exception as e:
+            results.append((module_name, e))
+    return results
+
 
 print("=" * 70)
 print(" " * 20 + "AgentFlow Diagnostics")
@@ -53,6 +67,17 @@ except Exception as e:
     print(f"   ❌ PyAutoGUI error: {e}")
 print()
 
+# Test 6 only imports modules - run it in the background while test 4
+# waits on the user's click, and print its results in order later
+agentflow_modules = [
+    'action_recorder',
+    'action_player',
+    'window_manager',
+    'minimal_overlay'
+]
+background = ThreadPoolExecutor(max_workers=1)
+agentflow_imports = background.submit(check_imports, agentflow_modules)
+
 # Test 4: Accessibility permissions
 print("4. Checking accessibility permissions...")
 print("   Testing if we can monitor mouse events...")
@@ -126,19 +151,12 @@ print()
 
 # Test 6: AgentFlow modules
 print("6. Checking AgentFlow modules...")
-agentflow_modules = [
-    'action_recorder',
-    'action_player',
-    'window_manager',
-    'minimal_overlay'
-]
-
-for module in agentflow_modules:
-    try:
-        __import__(module)
+for module, error in agentflow_imports.result():
+    if error is None:
         print(f"   ✅ {module}.py")
-    except Exception as e:
-        print(f"   ❌ {module}.py - {e}")
+    else:
+        print(f"   ❌ {module}.py - {error}")
+background.shutdown()
 
 print()
 